@@ -1,10 +1,23 @@
 from django.contrib import admin
-from .models import Category, LogisticsCompany, Supplier, VerificationCheck
+from .models import Category, City, Country, LogisticsCompany, Supplier, VerificationCheck
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ("name", "slug")
 
+@admin.register(Country)
+class CountryAdmin(admin.ModelAdmin):
+    list_display = ("name", "code")
+    search_fields = ("name", "code")
+
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    list_display = ("name", "country")
+    list_filter = ("country",)
+    list_select_related = ("country",)
+    search_fields = ("name",)
+    autocomplete_fields = ("country",)
+
 @admin.register(LogisticsCompany)
 class LogisticsCompanyAdmin(admin.ModelAdmin):
     list_display = ("name", "site")
@@ -23,7 +36,9 @@ class SupplierAdmin(admin.ModelAdmin):
         "created_at",
     )
     list_filter = ("country", "category", "verification_status", "created_at")
+    list_select_related = ("country", "city", "category")
     search_fields = ("name", "description")
+    autocomplete_fields = ("country", "city")
     readonly_fields = ("verification_status", "verification_score", "last_verified_at")
 
 
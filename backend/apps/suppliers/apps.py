@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class SuppliersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.suppliers'
-    verbose_name = 'Поставщики'
\ No newline at end of file
+    verbose_name = 'Поставщики'
+
+    def ready(self):
+        from . import signals  # noqa: F401
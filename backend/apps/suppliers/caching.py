@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import hashlib
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+LIST_TAG = "suppliers"
+
+
+def supplier_tag(supplier_id: int) -> str:
+    return f"supplier:{supplier_id}"
+
+
+def category_tag(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+class ResponseCache:
+    """
+    Rendered API responses in the Django cache, invalidated by tags.
+
+    Every tag has a version token stored without expiry; the entry key
+    includes the versions of its tags, so bumping a tag orphans all entries
+    built under the old version (they then expire by timeout). Tokens are
+    random rather than counters, so an evicted version can never resurrect
+    a stale entry.
+    """
+
+    VERSION_PREFIX = "supplier-cache:tag"
+    # v2: записи хранят версии тегов категорий — старые кортежи не читаются
+    KEY_PREFIX = "supplier-cache:response:v2"
+
+    @classmethod
+    def key(cls, request, tags: Iterable[str]) -> str:
+        versions = cls.versions(tags)
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        source = "|".join([request.path, repr(params), *(f"{tag}={versions[tag]}" for tag in sorted(versions))])
+        return f"{cls.KEY_PREFIX}:{hashlib.sha256(source.encode()).hexdigest()}"
+
+    @classmethod
+    def versions(cls, tags: Iterable[str]) -> dict:
+        keys = {tag: f"{cls.VERSION_PREFIX}:{tag}" for tag in tags}
+        stored = cache.get_many(keys.values())
+        versions = {}
+        for tag, key in keys.items():
+            if key not in stored:
+                cache.add(key, uuid.uuid4().hex, None)
+                stored[key] = cache.get(key)
+            versions[tag] = stored[key]
+        return versions
+
+    @classmethod
+    def invalidate(cls, tags: Iterable[str]) -> None:
+        cache.set_many({f"{cls.VERSION_PREFIX}:{tag}": uuid.uuid4().hex for tag in tags}, None)
+
+
+def response_tags(supplier_ids: Iterable[int], category_ids: Iterable[int] = ()) -> List[str]:
+    return [
+        LIST_TAG,
+        *(supplier_tag(pk) for pk in supplier_ids),
+        *(category_tag(pk) for pk in category_ids),
+    ]
+
+
+def invalidate_suppliers(supplier_ids: Iterable[int], category_ids: Iterable[int] = ()) -> None:
+    """
+    Сбрасывает кэш списка и карточек перечисленных поставщиков; ``category_ids``
+    — категории, в которых изменился состав (их счётчик в карточках других поставщиков)
+    """
+    supplier_ids = list(supplier_ids)
+    category_ids = list(category_ids)
+    ResponseCache.invalidate(response_tags(supplier_ids, category_ids))
+    if getattr(settings, "DATABASE_REPLICAS", []):
+        # Промах кэша, пока реплика не догнала primary, закэшировал бы старые
+        # данные под новой версией тега — сбрасываем ещё раз после окна отставания
+        from .tasks import expire_supplier_responses
+
+        expire_supplier_responses.apply_async(
+            (supplier_ids, category_ids), countdown=getattr(settings, "DATABASE_PRIMARY_PIN_SECONDS", 10)
+        )
+
+
+class CachedConditionalGetMixin:
+    """
+    Cached, conditional ``list`` and ``retrieve`` for a supplier viewset.
+
+    Rendered responses are kept in ``ResponseCache`` under the normalized
+    query parameters (list pages under the ``suppliers`` tag, details under
+    ``supplier:<id>``) together with their validators. A list's ETag is
+    derived from its cache key, i.e. from the query and the ``suppliers``
+    tag version that every supplier write (deletes included) bumps, so no
+    aggregate over the catalogue is needed; lists carry no
+    ``Last-Modified``, since a delete would not move it. A detail's
+    validators come from its row: the supplier's and its current check's
+    ``updated_at``. A detail also shows ``supplier_count`` of its category,
+    which changes with other suppliers' writes: the entry records the
+    version of the ``category:<id>`` tag it was built under (it is part of
+    the ETag too) and is dropped once that tag is bumped. A matching
+    ``If-None-Match`` / ``If-Modified-Since`` gets a 304 before pagination
+    and serialization run.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(
+            request,
+            [LIST_TAG],
+            lambda key: (self.get_list_etag(key), None, {}),
+            super().list,
+            *args,
+            **kwargs,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not self._is_valid_lookup(lookup):
+            # Как и get_object(), отвечаем 404 на id не того типа (например, «abc»)
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional(
+            request,
+            [supplier_tag(lookup)],
+            lambda key: self.get_validators(
+                request, self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: lookup})
+            ),
+            super().retrieve,
+            *args,
+            **kwargs,
+        )
+
+    def _is_valid_lookup(self, lookup) -> bool:
+        try:
+            self.get_queryset().none().filter(**{self.lookup_field: lookup})
+        except (TypeError, ValueError, ValidationError):
+            return False
+        return True
+
+    @staticmethod
+    def get_list_etag(key: str) -> str:
+        return quote_etag(key.rsplit(":", 1)[-1][:32])
+
+    def get_validators(self, request, queryset) -> Tuple[Optional[str], Optional[datetime], Dict[str, str]]:
+        """
+        Валидаторы карточки (``queryset`` содержит не больше одной строки)
+        и версии тегов, от которых она ещё зависит
+        """
+        stats = queryset.order_by().aggregate(
+            supplier_updated=Max("updated_at"),
+            check_updated=Max("latest_check__updated_at"),
+            category=Max("category_id"),
+            rows=Count("pk"),
+        )
+        if not stats["rows"]:
+            return None, None, {}
+        last_modified = max(
+            value for value in (stats["supplier_updated"], stats["check_updated"]) if value is not None
+        )
+        dependencies = ResponseCache.versions([category_tag(stats["category"])]) if stats["category"] else {}
+        digest = hashlib.sha256(
+            "|".join(
+                [
+                    request.get_full_path(),
+                    str(stats["rows"]),
+                    stats["supplier_updated"].isoformat() if stats["supplier_updated"] else "",
+                    stats["check_updated"].isoformat() if stats["check_updated"] else "",
+                    *dependencies.values(),
+                ]
+            ).encode()
+        ).hexdigest()
+        return quote_etag(digest[:32]), last_modified, dependencies
+
+    def _conditional(
+        self,
+        request,
+        tags: List[str],
+        get_validators: Callable[[str], Tuple[Optional[str], Optional[datetime], Dict[str, str]]],
+        render,
+        *args,
+        **kwargs,
+    ):
+        key = ResponseCache.key(request, tags)
+        entry = cache.get(key)
+        if entry is not None:
+            etag, timestamp, data, dependencies = entry
+            if dependencies and ResponseCache.versions(dependencies) != dependencies:
+                entry = None
+        if entry is None:
+            etag, last_modified, dependencies = get_validators(key)
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        if entry is not None:
+            response = Response(data)
+        else:
+            response = render(request, *args, **kwargs)
+            if response.status_code == 200:
+                timeout = getattr(settings, "SUPPLIER_RESPONSE_CACHE_TIMEOUT", 5 * 60)
+                cache.set(key, (etag, timestamp, response.data, dependencies), timeout)
+        if response.status_code == 200:
+            if etag:
+                response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            # Клиент хранит ответ, но каждый раз перепроверяет валидаторы
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
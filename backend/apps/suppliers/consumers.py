@@ -0,0 +1,26 @@
+import json
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .progress import verification_group
+
+
+class SupplierVerificationConsumer(AsyncWebsocketConsumer):
+    """WebSocket с ходом проверки поставщика: результат каждого реестра и итоговый балл"""
+
+    async def connect(self):
+        if not self.scope['user'].is_authenticated:
+            await self.close()
+            return
+        self.supplier_id = self.scope['url_route']['kwargs']['supplier_id']
+        self.group_name = verification_group(self.supplier_id)
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def verification_event(self, event):
+        await self.send(text_data=json.dumps(event['message'], ensure_ascii=False))
@@ -0,0 +1,67 @@
+import django_filters
+from django.db.models import Q
+from rest_framework import filters
+
+from . import reference
+from .models import City, Supplier
+from .search import SupplierSearchIndex
+
+
+class SupplierFilterSet(django_filters.FilterSet):
+    country = django_filters.CharFilter(
+        method="filter_country",
+        label="Страна: id, ISO-код или название",
+    )
+    city = django_filters.CharFilter(
+        method="filter_city",
+        label="Город: id или название",
+    )
+    category_tree = django_filters.CharFilter(
+        method="filter_category_tree",
+        label="Слаг категории (вместе с подкатегориями)",
+    )
+
+    class Meta:
+        model = Supplier
+        fields = ["country", "category__slug", "city", "moq"]
+
+    def filter_country(self, queryset, name, value):
+        value = value.strip()
+        if value.isdigit():
+            return queryset.filter(country_id=int(value))
+        return queryset.filter(country_id__in=reference.country_ids(value))
+
+    def filter_city(self, queryset, name, value):
+        value = value.strip()
+        if value.isdigit():
+            return queryset.filter(city_id=int(value))
+        return queryset.filter(city_id__in=City.objects.filter(name=value).values("pk"))
+
+    def filter_category_tree(self, queryset, name, value):
+        """Основная или дополнительная категория лежит в поддереве ``value``"""
+        subtree = reference.category_subtree_ids(value)
+        if subtree is None:
+            return queryset.none()
+        additional = Supplier.additional_categories.through.objects.filter(
+            category__in=subtree
+        ).values("supplier_id")
+        return queryset.filter(Q(category__in=subtree) | Q(pk__in=additional))
+
+
+class SupplierSearchFilter(filters.SearchFilter):
+    """
+    Replaces the ``icontains`` scans of ``SearchFilter`` with the full-text index.
+
+    Must run after ``OrderingFilter``: without an explicit ``ordering`` parameter
+    results are sorted by relevance.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        queryset = SupplierSearchIndex.search(queryset, query)
+        ordering_param = getattr(view, "ordering_param", filters.OrderingFilter.ordering_param)
+        if not request.query_params.get(ordering_param):
+            queryset = queryset.order_by("-search_rank", "-id")
+        return queryset
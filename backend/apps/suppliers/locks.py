@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import logging
+import uuid
+from typing import Optional
+
+import redis
+from django.conf import settings
+
+from apps.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationLock:
+    """
+    Distributed per-supplier lock: only one verification of a supplier runs at a time.
+
+    The lock is a Redis key holding a random token, so only its owner can
+    release it; it expires after ``timeout`` seconds in case the worker dies.
+    If Redis is unreachable the lock is considered acquired.
+    """
+
+    KEY_PREFIX = "verification:lock"
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, supplier_id: int, timeout: int):
+        self.supplier_id = supplier_id
+        self.key = f"{self.KEY_PREFIX}:{supplier_id}"
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        try:
+            return bool(get_redis().set(self.key, self.token, nx=True, ex=self.timeout))
+        except redis.RedisError as exc:
+            logger.debug("Verification lock unavailable: %s", exc)
+            return True
+
+    def release(self) -> None:
+        try:
+            get_redis().eval(self.RELEASE_SCRIPT, 1, self.key, self.token)
+        except redis.RedisError as exc:
+            logger.debug("Verification lock unavailable: %s", exc)
+
+
+class VerificationEnqueueGuard:
+    """
+    Coalesces repeated verification requests for a supplier.
+
+    The first request within ``VERIFICATION_DEDUPE_WINDOW`` seconds claims
+    the supplier with its task ID; repeats get that task ID back instead of
+    enqueueing another run.
+    """
+
+    KEY_PREFIX = "verification:enqueued"
+
+    def __init__(self, supplier_id: int):
+        self.key = f"{self.KEY_PREFIX}:{supplier_id}"
+        self.window = getattr(settings, "VERIFICATION_DEDUPE_WINDOW", 60)
+
+    def claim(self, task_id: str) -> Optional[str]:
+        """Returns the ID of an already enqueued task, ``None`` if ``task_id`` won the claim."""
+        try:
+            client = get_redis()
+            if client.set(self.key, task_id, nx=True, ex=self.window):
+                return None
+            return client.get(self.key)
+        except redis.RedisError as exc:
+            logger.debug("Verification enqueue guard unavailable: %s", exc)
+            return None
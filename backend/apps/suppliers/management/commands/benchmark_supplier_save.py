@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.suppliers.models import Category, City, Country, Supplier, VerificationStatus
+
+
+class Command(BaseCommand):
+    help = "Измеряет стоимость Supplier.save: полная валидация, валидация update_fields и trusted-режим"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=500)
+
+    def handle(self, *args, iterations, **options):
+        # Все записи бенчмарка откатываются
+        with transaction.atomic():
+            category = Category.objects.create(name="Benchmark", slug="benchmark-supplier-save")
+            country, _ = Country.objects.get_or_create(code="CN", defaults={"name": "Китай"})
+            city, _ = City.objects.get_or_create(country=country, name="Шэньчжэнь")
+            supplier = Supplier.objects.create(
+                name="Benchmark",
+                country=country,
+                city=city,
+                website="https://example.com",
+                video_url="https://youtu.be/benchmark",
+                category=category,
+            )
+            fields = Supplier.VERIFICATION_RESULT_FIELDS
+            modes = [
+                ("save(), полная валидация", lambda: supplier.save()),
+                ("update_fields + full_clean (было)", lambda: self._full_clean_save(supplier, fields)),
+                ("update_fields (стало)", lambda: supplier.save(update_fields=fields)),
+                ("update_fields, trusted", lambda: supplier.save(update_fields=fields, trusted=True)),
+            ]
+            for label, save in modes:
+                self._report(label, supplier, save, iterations)
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _full_clean_save(supplier, fields):
+        supplier.full_clean()
+        super(Supplier, supplier).save(update_fields=fields)
+
+    def _report(self, label, supplier, save, iterations):
+        supplier.verification_status = VerificationStatus.COMPLETED
+        supplier.last_verified_at = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            save()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            save()
+        elapsed = (time.perf_counter() - started) / iterations * 1_000_000
+        self.stdout.write(f"{label:<34} {elapsed:9.1f} µs/save  {len(queries):2d} запросов")
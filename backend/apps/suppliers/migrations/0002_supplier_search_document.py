@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+FTS_TABLE = "suppliers_supplier_fts"
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE suppliers_supplier ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(search_document, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(search_document, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX suppliers_supplier_search_gin ON suppliers_supplier USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS suppliers_supplier_search_gin",
+    "ALTER TABLE suppliers_supplier DROP COLUMN IF EXISTS search_vector",
+]
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "name, document, tokenize = 'porter unicode61 remove_diacritics 2')",
+]
+SQLITE_BACKWARD = [f"DROP TABLE IF EXISTS {FTS_TABLE}"]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _execute(schema_editor, POSTGRES_FORWARD)
+    elif vendor == "sqlite":
+        _execute(schema_editor, SQLITE_FORWARD)
+
+    Category = apps.get_model("suppliers", "Category")
+    Supplier = apps.get_model("suppliers", "Supplier")
+    categories = {category.pk: category for category in Category.objects.all()}
+
+    def full_path(category_id):
+        names = []
+        while category_id is not None:
+            category = categories[category_id]
+            names.append(category.name)
+            category_id = category.parent_id
+        return " → ".join(reversed(names))
+
+    suppliers = Supplier.objects.prefetch_related("additional_categories", "logistics_options")
+    for supplier in suppliers.iterator(chunk_size=500):
+        parts = [supplier.description, supplier.country, supplier.city]
+        if supplier.category_id:
+            parts.append(full_path(supplier.category_id))
+        parts.extend(full_path(category.pk) for category in supplier.additional_categories.all())
+        parts.extend(company.name for company in supplier.logistics_options.all())
+        supplier.search_document = " ".join(part for part in parts if part)
+        Supplier.objects.filter(pk=supplier.pk).update(search_document=supplier.search_document)
+        if vendor == "sqlite":
+            schema_editor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, document) VALUES (%s, %s, %s)",
+                (supplier.pk, supplier.name, supplier.search_document),
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _execute(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == "sqlite":
+        _execute(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+CATALOGUE_INDEX = "supplier_catalogue_keyset_idx"
+
+
+def create_catalogue_index(apps, schema_editor):
+    # NULLS LAST в определении индекса поддерживает только PostgreSQL
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX {CATALOGUE_INDEX} ON suppliers_supplier "
+        "(is_premium DESC, verification_score DESC NULLS LAST, created_at DESC, id) "
+        "WHERE is_active"
+    )
+
+
+def drop_catalogue_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {CATALOGUE_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0002_supplier_search_document'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='supplier',
+            options={'ordering': ['-is_premium', models.OrderBy(models.F('verification_score'), descending=True, nulls_last=True), '-created_at', 'id'], 'verbose_name': 'Поставщик', 'verbose_name_plural': 'Поставщики'},
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at', 'id'], name='supplier_created_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['moq', 'id'], name='supplier_moq_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name', 'id'], name='supplier_name_keyset_idx'),
+        ),
+        migrations.RunPython(create_catalogue_index, drop_catalogue_index),
+    ]
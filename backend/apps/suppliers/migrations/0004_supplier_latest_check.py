@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_latest_check(apps, schema_editor):
+    Supplier = apps.get_model("suppliers", "Supplier")
+    VerificationCheck = apps.get_model("suppliers", "VerificationCheck")
+    latest = (
+        VerificationCheck.objects.filter(supplier=OuterRef("pk"))
+        .order_by("-created_at", "-id")
+        .values("pk")[:1]
+    )
+    Supplier.objects.update(latest_check=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0003_supplier_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='latest_check',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='suppliers.verificationcheck', verbose_name='Последняя проверка'),
+        ),
+        migrations.RunPython(backfill_latest_check, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+def backfill_tree_fields(apps, schema_editor):
+    Category = apps.get_model("suppliers", "Category")
+    categories = {category.pk: category for category in Category.objects.all()}
+
+    def fill(category):
+        if category.path:
+            return category
+        parent = fill(categories[category.parent_id]) if category.parent_id else None
+        category.path = f"{parent.path if parent else ''}{category.pk}/"
+        category.depth = parent.depth + 1 if parent else 0
+        category.full_name = f"{parent.full_name} → {category.name}" if parent else category.name
+        return category
+
+    for category in categories.values():
+        fill(category)
+    Category.objects.bulk_update(categories.values(), ["path", "depth", "full_name"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0004_supplier_latest_check'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Уровень'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='full_name',
+            field=models.CharField(blank=True, editable=False, max_length=1000, verbose_name='Полный путь'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Путь в дереве'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_tree_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0005_category_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(condition=models.Q(('is_active', True), ('verification_expires_at__isnull', False)), fields=['verification_expires_at', 'id'], name='supplier_renewal_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:08
+
+import hashlib
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def move_payloads(apps, schema_editor):
+    VerificationCheck = apps.get_model("suppliers", "VerificationCheck")
+    VerificationPayload = apps.get_model("suppliers", "VerificationPayload")
+    checks = []
+    payloads = {}
+    for check in VerificationCheck.objects.only("pk", "checked_sources").iterator(chunk_size=500):
+        changed = False
+        for result in (check.checked_sources or {}).values():
+            if not isinstance(result, dict) or not result.get("payload"):
+                continue
+            raw = json.dumps(result.pop("payload"), sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode()
+            digest = hashlib.sha256(raw).hexdigest()
+            payloads.setdefault(digest, VerificationPayload(digest=digest, data=zlib.compress(raw), size=len(raw)))
+            result["payload_ref"] = digest
+            changed = True
+        if changed:
+            checks.append(check)
+        if len(checks) >= 500:
+            VerificationPayload.objects.bulk_create(payloads.values(), ignore_conflicts=True)
+            VerificationCheck.objects.bulk_update(checks, ["checked_sources"])
+            checks, payloads = [], {}
+    VerificationPayload.objects.bulk_create(payloads.values(), ignore_conflicts=True)
+    VerificationCheck.objects.bulk_update(checks, ["checked_sources"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0006_supplier_renewal_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificationPayload',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('data', models.BinaryField(verbose_name='Данные (zlib)')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер без сжатия')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Ответ реестра',
+                'verbose_name_plural': 'Ответы реестров',
+            },
+        ),
+        migrations.RunPython(move_payloads, migrations.RunPython.noop),
+    ]
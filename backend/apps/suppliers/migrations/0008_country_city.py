@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0007_verification_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Country',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(blank=True, max_length=2, null=True, unique=True, verbose_name='ISO-код')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+            ],
+            options={
+                'verbose_name': 'Страна',
+                'verbose_name_plural': 'Страны',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='cities', to='suppliers.country', verbose_name='Страна')),
+            ],
+            options={
+                'verbose_name': 'Город',
+                'verbose_name_plural': 'Города',
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(fields=('country', 'name'), name='city_country_name_uniq')],
+            },
+        ),
+        # Временные ключи: заполняются 0009 и заменяют строковые поля в 0010
+        migrations.AddField(
+            model_name='supplier',
+            name='country_ref',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suppliers.country'),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='city_ref',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suppliers.city'),
+        ),
+        migrations.AddField(
+            model_name='verificationcheck',
+            name='country_ref',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suppliers.country'),
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+from django.db import migrations
+
+# Страны, встречающиеся в каталоге и в реестрах проверки (ISO 3166-1 alpha-2)
+COUNTRY_CODES = {
+    "Австралия": "AU",
+    "Армения": "AM",
+    "Бангладеш": "BD",
+    "Беларусь": "BY",
+    "Бразилия": "BR",
+    "Великобритания": "GB",
+    "Вьетнам": "VN",
+    "Германия": "DE",
+    "Грузия": "GE",
+    "Египет": "EG",
+    "Израиль": "IL",
+    "Индия": "IN",
+    "Индонезия": "ID",
+    "Испания": "ES",
+    "Италия": "IT",
+    "Казахстан": "KZ",
+    "Канада": "CA",
+    "Киргизия": "KG",
+    "Китай": "CN",
+    "Малайзия": "MY",
+    "Мексика": "MX",
+    "Нидерланды": "NL",
+    "ОАЭ": "AE",
+    "Пакистан": "PK",
+    "Польша": "PL",
+    "Португалия": "PT",
+    "Россия": "RU",
+    "Саудовская Аравия": "SA",
+    "США": "US",
+    "Таджикистан": "TJ",
+    "Таиланд": "TH",
+    "Тайвань": "TW",
+    "Турция": "TR",
+    "Узбекистан": "UZ",
+    "Франция": "FR",
+    "Чехия": "CZ",
+    "Южная Корея": "KR",
+    "Япония": "JP",
+}
+# Написания, которые встречаются в свободном вводе
+COUNTRY_ALIASES = {
+    "кнр": "CN",
+    "рф": "RU",
+    "российская федерация": "RU",
+    "сша": "US",
+    "корея": "KR",
+    "республика корея": "KR",
+    "белоруссия": "BY",
+    "кыргызстан": "KG",
+    "объединённые арабские эмираты": "AE",
+    "объединенные арабские эмираты": "AE",
+}
+
+
+def normalize(value):
+    return " ".join((value or "").split())
+
+
+def backfill(apps, schema_editor):
+    Country = apps.get_model("suppliers", "Country")
+    City = apps.get_model("suppliers", "City")
+    Supplier = apps.get_model("suppliers", "Supplier")
+    VerificationCheck = apps.get_model("suppliers", "VerificationCheck")
+
+    names_by_code = {code: name for name, code in COUNTRY_CODES.items()}
+    codes = {name.lower(): code for name, code in COUNTRY_CODES.items()}
+    codes.update(COUNTRY_ALIASES)
+    Country.objects.bulk_create(
+        [Country(code=code, name=name) for code, name in names_by_code.items()],
+        ignore_conflicts=True,
+    )
+    countries = {country.name.lower(): country for country in Country.objects.all()}
+
+    def country_for(raw):
+        name = normalize(raw)
+        code = codes.get(name.lower())
+        if code:
+            name = names_by_code[code]
+        if name.lower() not in countries:
+            countries[name.lower()] = Country.objects.create(name=name)
+        return countries[name.lower()]
+
+    cities = {}
+    # Один UPDATE на пару (страна, город) в исходном написании; из вариантов
+    # одного города в справочник попадает написанный с заглавной буквы
+    pairs = Supplier.objects.order_by().values_list("country", "city").distinct()
+    for raw_country, raw_city in sorted(pairs, key=lambda pair: normalize(pair[1])[:1].islower()):
+        country = country_for(raw_country)
+        city_name = normalize(raw_city)
+        key = (country.pk, city_name.lower())
+        if key not in cities:
+            cities[key] = (
+                City.objects.filter(country=country, name__iexact=city_name).first()
+                or City.objects.create(country=country, name=city_name)
+            )
+        Supplier.objects.filter(country=raw_country, city=raw_city).update(
+            country_ref=country, city_ref=cities[key]
+        )
+
+    for raw_country in VerificationCheck.objects.order_by().values_list("country", flat=True).distinct():
+        VerificationCheck.objects.filter(country=raw_country).update(country_ref=country_for(raw_country))
+
+
+def restore(apps, schema_editor):
+    Country = apps.get_model("suppliers", "Country")
+    City = apps.get_model("suppliers", "City")
+    Supplier = apps.get_model("suppliers", "Supplier")
+    VerificationCheck = apps.get_model("suppliers", "VerificationCheck")
+    for country in Country.objects.all():
+        Supplier.objects.filter(country_ref=country).update(country=country.name)
+        VerificationCheck.objects.filter(country_ref=country).update(country=country.name)
+    for city in City.objects.all():
+        Supplier.objects.filter(city_ref=city).update(city=city.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0008_country_city'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, restore),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0009_backfill_country_city'),
+    ]
+
+    operations = [
+        # Значение по умолчанию нужно только откату: колонки добавляются обратно в заполненные таблицы
+        migrations.AlterField(
+            model_name='supplier',
+            name='country',
+            field=models.CharField(db_index=True, default='', max_length=100, verbose_name='Страна'),
+        ),
+        migrations.AlterField(
+            model_name='supplier',
+            name='city',
+            field=models.CharField(db_index=True, default='', max_length=100, verbose_name='Город'),
+        ),
+        migrations.AlterField(
+            model_name='verificationcheck',
+            name='country',
+            field=models.CharField(default='', max_length=100, verbose_name='Страна проверки'),
+        ),
+        migrations.RemoveIndex(
+            model_name='supplier',
+            name='suppliers_s_country_1d0221_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='verificationcheck',
+            name='suppliers_v_country_6da639_idx',
+        ),
+        migrations.RemoveField(
+            model_name='supplier',
+            name='country',
+        ),
+        migrations.RemoveField(
+            model_name='supplier',
+            name='city',
+        ),
+        migrations.RemoveField(
+            model_name='verificationcheck',
+            name='country',
+        ),
+        migrations.RenameField(
+            model_name='supplier',
+            old_name='country_ref',
+            new_name='country',
+        ),
+        migrations.RenameField(
+            model_name='supplier',
+            old_name='city_ref',
+            new_name='city',
+        ),
+        migrations.RenameField(
+            model_name='verificationcheck',
+            old_name='country_ref',
+            new_name='country',
+        ),
+        migrations.AlterField(
+            model_name='supplier',
+            name='country',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='suppliers', to='suppliers.country', verbose_name='Страна'),
+        ),
+        migrations.AlterField(
+            model_name='supplier',
+            name='city',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='suppliers', to='suppliers.city', verbose_name='Город'),
+        ),
+        migrations.AlterField(
+            model_name='verificationcheck',
+            name='country',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='suppliers.country', verbose_name='Страна проверки'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['country', 'city', 'is_active'], name='suppliers_s_country_9956ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='verificationcheck',
+            index=models.Index(fields=['country', 'risk_level'], name='suppliers_v_country_dd83a5_idx'),
+        ),
+    ]
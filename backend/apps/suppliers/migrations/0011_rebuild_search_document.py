@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from apps.suppliers.search import SupplierSearchIndex
+
+
+def rebuild_search_document(apps, schema_editor):
+    # 0009 перенёс страну и город в справочники с нормализованными названиями
+    # («КНР» → «Китай»): документ и FTS-строки собираются заново тем же кодом,
+    # что и в сигналах; tsvector в PostgreSQL пересчитывается сам (generated column)
+    Supplier = apps.get_model("suppliers", "Supplier")
+    supplier_ids = Supplier.objects.order_by("pk").values_list("pk", flat=True)
+    SupplierSearchIndex.update(list(supplier_ids), model=Supplier)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0010_supplier_country_city_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_document, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,14 @@
+import hashlib
+import json
+import zlib
 from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Tuple
+
 from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Substr
 from django.core.validators import MinValueValidator, URLValidator
-from django.core.exceptions import ValidationError
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.utils import timezone
 
 class Category(models.Model):
@@ -19,12 +26,18 @@ class Category(models.Model):
     description = models.TextField("Описание", blank=True)
     icon = models.CharField("Иконка (emoji)", max_length=5, blank=True)
     
+    # Материализованный путь: id предков и самой категории, например '1/101/'
+    path = models.CharField("Путь в дереве", max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField("Уровень", default=0, editable=False)
+    full_name = models.CharField("Полный путь", max_length=1000, blank=True, editable=False)
+    
     class Meta:
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
         ordering = ['parent__id', 'id']
         indexes = [
             models.Index(fields=['parent', 'slug']),
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
         ]
 
     def __str__(self):
@@ -32,11 +45,61 @@ class Category(models.Model):
             return f"{self.parent.name} → {self.name}"
         return self.name
 
+    def clean(self):
+        self.validate_parent()
+
+    def validate_parent(self) -> None:
+        if self.pk is None or self.parent_id is None:
+            return
+        parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first()
+        if self.parent_id == self.pk or (parent_path or "").startswith(self.get_path_prefix()):
+            raise ValidationError({"parent": "Категория не может быть вложена в саму себя"})
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # Путь содержит собственный id, поэтому считается после INSERT
+            super().save(*args, **kwargs)
+            self.update_tree_fields()
+            return
+        self.validate_parent()
+        previous = Category.objects.filter(pk=self.pk).values("path", "full_name", "depth").first()
+        self.update_tree_fields(previous)
+        super().save(*args, **kwargs)
+
+    def update_tree_fields(self, previous: dict | None = None) -> None:
+        """Пересчитывает path/depth/full_name и переносит поддерево одним UPDATE"""
+        parent = None
+        if self.parent_id:
+            parent = Category.objects.values("path", "full_name", "depth").get(pk=self.parent_id)
+
+        self.path = f"{parent['path'] if parent else ''}{self.pk}/"
+        self.depth = parent["depth"] + 1 if parent else 0
+        self.full_name = f"{parent['full_name']} → {self.name}" if parent else self.name
+        current = {"path": self.path, "full_name": self.full_name, "depth": self.depth}
+        if current == previous:
+            return
+
+        Category.objects.filter(pk=self.pk).update(**current)
+        if previous and previous["path"]:
+            Category.objects.filter(path__startswith=previous["path"]).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr("path", len(previous["path"]) + 1)),
+                full_name=Concat(Value(self.full_name), Substr("full_name", len(previous["full_name"]) + 1)),
+                depth=F("depth") + (self.depth - previous["depth"]),
+            )
+
+    def get_path_prefix(self) -> str:
+        return self.path or f"{self.pk}/"
+
+    def get_descendants(self, include_self: bool = True):
+        """Поддерево категории одним запросом по индексу path"""
+        descendants = Category.objects.filter(path__startswith=self.get_path_prefix())
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
     def get_full_path(self):
         """Возвращает полный путь категории (например: 'Электроника → Смартфоны')"""
-        if self.parent:
-            return f"{self.parent.get_full_path()} → {self.name}"
-        return self.name
+        return self.full_name or self.name
 
 
 class LogisticsCompany(models.Model):
@@ -55,6 +118,46 @@ class LogisticsCompany(models.Model):
         return self.name
 
 
+class Country(models.Model):
+    """Справочник стран; ``code`` — ISO 3166-1 alpha-2"""
+    # Стран меньше 300: smallint-ключ держит индексы поставщиков и проверок компактными
+    id = models.SmallAutoField(primary_key=True)
+    code = models.CharField("ISO-код", max_length=2, unique=True, null=True, blank=True)
+    name = models.CharField("Название", max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = "Страна"
+        verbose_name_plural = "Страны"
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.code:
+            self.code = self.code.upper()
+            if len(self.code) != 2 or not self.code.isalpha():
+                raise ValidationError({"code": "Двухбуквенный код ISO 3166-1"})
+
+
+class City(models.Model):
+    """Справочник городов в разрезе стран"""
+    id = models.AutoField(primary_key=True)
+    country = models.ForeignKey(Country, on_delete=models.PROTECT, related_name="cities", verbose_name="Страна")
+    name = models.CharField("Название", max_length=100)
+
+    class Meta:
+        verbose_name = "Город"
+        verbose_name_plural = "Города"
+        ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(fields=["country", "name"], name="city_country_name_uniq"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
 class VerificationStatus(models.TextChoices):
     NOT_STARTED = "not_started", "Не запущена"
     IN_PROGRESS = "in_progress", "В процессе"
@@ -70,9 +173,27 @@ class VerificationRiskLevel(models.TextChoices):
 
 class Supplier(models.Model):
     """Модель поставщика с верификацией и иерархическими категориями"""
+    # За сколько до истечения проверку можно (и нужно) продлевать
+    RENEWAL_LEAD_TIME = timezone.timedelta(days=7)
+    # Поля, которые меняет применение результата проверки
+    VERIFICATION_RESULT_FIELDS = [
+        "verification_status",
+        "verification_score",
+        "is_verified",
+        "last_verified_at",
+        "verification_expires_at",
+    ]
+
     name = models.CharField("Название", max_length=150, db_index=True)
-    country = models.CharField("Страна", max_length=100, db_index=True)
-    city = models.CharField("Город", max_length=100, db_index=True)
+    # Отдельный индекс по стране не нужен: она ведёт составной индекс (country, city, is_active)
+    country = models.ForeignKey(
+        Country,
+        on_delete=models.PROTECT,
+        db_index=False,
+        related_name="suppliers",
+        verbose_name="Страна"
+    )
+    city = models.ForeignKey(City, on_delete=models.PROTECT, related_name="suppliers", verbose_name="Город")
     description = models.TextField("Описание", blank=True)
     logo = models.ImageField("Логотип", upload_to="suppliers/logos/%Y/%m/", blank=True)
     video_url = models.URLField("YouTube-видео", blank=True, validators=[URLValidator()])
@@ -132,6 +253,16 @@ class Supplier(models.Model):
     is_verified = models.BooleanField("Проверен", default=False, db_index=True)
     last_verified_at = models.DateTimeField("Дата проверки", blank=True, null=True)
     verification_expires_at = models.DateTimeField("Срок действия проверки", blank=True, null=True)
+    # Указатель на последнюю проверку, поддерживается VerificationCheck.save
+    latest_check = models.ForeignKey(
+        "VerificationCheck",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        verbose_name="Последняя проверка"
+    )
     
     # Бизнес-метрики
     is_active = models.BooleanField("Активен", default=True, db_index=True)
@@ -143,21 +274,42 @@ class Supplier(models.Model):
     avg_response_time_hours = models.PositiveIntegerField("Среднее время ответа (часы)", null=True, blank=True)
     quote_acceptance_rate = models.DecimalField("Конверсия котировок", max_digits=5, decimal_places=2, null=True, blank=True)
     
+    # Денормализованный текст для полнотекстового поиска (см. search.py)
+    search_document = models.TextField("Поисковый документ", blank=True, editable=False)
+    
     class Meta:
         verbose_name = "Поставщик"
         verbose_name_plural = "Поставщики"
-        ordering = ["-is_premium", "-verification_score", "-created_at"]
+        # id замыкает сортировку, чтобы keyset-пагинация была стабильной;
+        # составной индекс под неё создаётся миграцией 0003 только в PostgreSQL
+        # (SQLite не поддерживает NULLS LAST в определении индекса)
+        ordering = ["-is_premium", F("verification_score").desc(nulls_last=True), "-created_at", "id"]
         indexes = [
             models.Index(fields=["country", "city", "is_active"]),
             models.Index(fields=["category", "is_verified", "is_active"]),
             models.Index(fields=["verification_status"]),
             models.Index(fields=["is_premium"]),
+            # Индексы под варианты ?ordering= каталога (обходятся в обе стороны)
+            models.Index(fields=["created_at", "id"], name="supplier_created_keyset_idx", condition=Q(is_active=True)),
+            models.Index(fields=["moq", "id"], name="supplier_moq_keyset_idx", condition=Q(is_active=True)),
+            models.Index(fields=["name", "id"], name="supplier_name_keyset_idx", condition=Q(is_active=True)),
+            # Выборка поставщиков на плановую перепроверку
+            models.Index(
+                fields=["verification_expires_at", "id"],
+                name="supplier_renewal_idx",
+                condition=Q(is_active=True, verification_expires_at__isnull=False),
+            ),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.country})"
     
     def clean(self):
+        # Сверяем только присвоенный объектом город (формы, сериализаторы), без лишнего запроса
+        city_field = self._meta.get_field("city")
+        if city_field.is_cached(self) and self.city and self.city.country_id != self.country_id:
+            raise ValidationError({"city": "Город не относится к выбранной стране"})
+
         if self.video_url and "youtube.com" not in self.video_url and "youtu.be" not in self.video_url:
             raise ValidationError({"video_url": "Только YouTube URL разрешены"})
         
@@ -166,8 +318,18 @@ class Supplier(models.Model):
             if self.verification_expires_at < self.last_verified_at:
                 raise ValidationError({"verification_expires_at": "Срок действия не может быть раньше даты проверки"})
     
-    def save(self, *args, **kwargs):
-        self.full_clean()
+    def save(self, *args, trusted: bool = False, **kwargs):
+        """
+        Полная валидация при обычном сохранении; при ``update_fields`` —
+        только записываемых полей. ``trusted=True`` — внутренние обновления
+        (задачи, пакетные операции), данные которых уже проверены кодом.
+        """
+        if not trusted:
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                self.full_clean()
+            else:
+                self.validate_fields(update_fields)
         
         # Автоматически вычисляем срок действия (90 дней для верифицированных)
         if self.is_verified and self.last_verified_at and not self.verification_expires_at:
@@ -175,8 +337,36 @@ class Supplier(models.Model):
         
         super().save(*args, **kwargs)
 
+    def validate_fields(self, fields: Iterable[str]) -> None:
+        """Аналог full_clean только для перечисленных полей (и ошибок clean() по ним)"""
+        written = {self._meta.get_field(name).name for name in fields}
+        exclude = {field.name for field in self._meta.fields if field.name not in written}
+        errors: dict = {}
+        for validate in (
+            lambda: self.clean_fields(exclude=exclude),
+            self.clean,
+            lambda: self.validate_unique(exclude=exclude),
+            lambda: self.validate_constraints(exclude=exclude),
+        ):
+            try:
+                validate()
+            except ValidationError as exc:
+                errors = exc.update_error_dict(errors)
+        errors = {
+            name: messages
+            for name, messages in errors.items()
+            if name in written or name == NON_FIELD_ERRORS
+        }
+        if errors:
+            raise ValidationError(errors)
+
     def apply_verification_result(self, check: "VerificationCheck") -> None:
         """Применяет результат проверки к поставщику"""
+        self.set_verification_result(check)
+        self.save(update_fields=self.VERIFICATION_RESULT_FIELDS + ["updated_at"], trusted=True)
+
+    def set_verification_result(self, check: "VerificationCheck") -> None:
+        """Переносит результат проверки в поля поставщика без сохранения"""
         self.verification_status = check.status
         self.verification_score = check.overall_score
         self.is_verified = check.is_verified
@@ -185,16 +375,6 @@ class Supplier(models.Model):
         # Вычисляем срок действия
         if self.is_verified:
             self.verification_expires_at = self.last_verified_at + timezone.timedelta(days=90)
-        
-        self.save(
-            update_fields=[
-                "verification_status",
-                "verification_score",
-                "is_verified",
-                "last_verified_at",
-                "verification_expires_at",
-            ]
-        )
     
     def is_verification_expired(self) -> bool:
         """Проверяет, истекла ли верификация"""
@@ -206,8 +386,7 @@ class Supplier(models.Model):
         """Возвращает дату дедлайна для продления верификации"""
         if not self.verification_expires_at:
             return None
-        # За 7 дней до истечения можно продлевать
-        return self.verification_expires_at - timezone.timedelta(days=7)
+        return self.verification_expires_at - self.RENEWAL_LEAD_TIME
 
 
 class VerificationCheck(models.Model):
@@ -219,7 +398,14 @@ class VerificationCheck(models.Model):
         verbose_name="Поставщик",
         db_index=True
     )
-    country = models.CharField("Страна проверки", max_length=100)
+    # Индекс по стране — составной (country, risk_level)
+    country = models.ForeignKey(
+        Country,
+        on_delete=models.PROTECT,
+        db_index=False,
+        related_name="+",
+        verbose_name="Страна проверки"
+    )
     
     status = models.CharField(
         "Статус",
@@ -257,7 +443,8 @@ class VerificationCheck(models.Model):
         db_index=True
     )
     
-    # Детали проверки
+    # Детали проверки: по каждому реестру статус, балл и ссылка на сырой ответ
+    # (VerificationPayload.digest), сами ответы в проверке не хранятся
     checked_sources = models.JSONField("Источники", default=dict, blank=True)
     error_message = models.TextField("Ошибка", blank=True)
     
@@ -334,4 +521,72 @@ class VerificationCheck(models.Model):
         # Автоматически пересчитываем скор при сохранении
         if self.status == VerificationStatus.COMPLETED:
             self.calculate_overall_score()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            self.set_as_latest()
+
+    def set_as_latest(self) -> None:
+        """Переставляет Supplier.latest_check на эту проверку, если она новее текущей"""
+        Supplier.objects.filter(pk=self.supplier_id).filter(
+            Q(latest_check__isnull=True) | Q(latest_check_id__lt=self.pk)
+        ).update(latest_check=self, updated_at=timezone.now())
+        if VerificationCheck.supplier.is_cached(self):
+            self.supplier.latest_check = self
+
+
+class VerificationPayload(models.Model):
+    """Сырой ответ реестра: сжатый JSON, адресуемый по SHA-256 содержимого"""
+    digest = models.CharField("SHA-256", max_length=64, primary_key=True)
+    data = models.BinaryField("Данные (zlib)")
+    size = models.PositiveIntegerField("Размер без сжатия")
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Ответ реестра"
+        verbose_name_plural = "Ответы реестров"
+
+    def __str__(self) -> str:
+        return self.digest
+
+    @classmethod
+    def build(cls, payload: Dict[str, Any]) -> "VerificationPayload":
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode()
+        return cls(
+            digest=hashlib.sha256(raw).hexdigest(),
+            data=zlib.compress(raw),
+            size=len(raw),
+        )
+
+    @classmethod
+    def split_sources(
+        cls, sources: Dict[str, Dict[str, Any]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List["VerificationPayload"]]:
+        """Заменяет сырые ответы в результатах по реестрам ссылками; возвращает сводку и ответы"""
+        summary: Dict[str, Dict[str, Any]] = {}
+        payloads: List[VerificationPayload] = []
+        for source, result in sources.items():
+            entry = {key: value for key, value in result.items() if key != "payload"}
+            if result.get("payload"):
+                payload = cls.build(result["payload"])
+                entry["payload_ref"] = payload.digest
+                payloads.append(payload)
+            summary[source] = entry
+        return summary, payloads
+
+    @classmethod
+    def store(cls, payloads: Iterable["VerificationPayload"]) -> None:
+        """Сохраняет ответы; уже известные (тот же digest) пропускаются"""
+        unique = {payload.digest: payload for payload in payloads}
+        if unique:
+            cls.objects.bulk_create(unique.values(), ignore_conflicts=True, batch_size=500)
+
+    @classmethod
+    def load_many(cls, digests: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return {
+            payload.digest: payload.load()
+            for payload in cls.objects.filter(digest__in=set(digests))
+        }
+
+    def load(self) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(bytes(self.data)))
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
+from django.db.models import F, Field, Q
+from django.db.models.expressions import OrderBy
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+class StandardPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+@dataclass(frozen=True)
+class KeysetTerm:
+    name: str
+    descending: bool
+    nullable: bool = False
+    nulls_last: bool = True
+    # Поле модели (или output_field аннотации) для разбора значения из курсора
+    field: Optional[Field] = field(default=None, compare=False)
+
+    def parse(self, value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, (list, dict)):
+            raise ValueError(f"Unexpected cursor value for {self.name}")
+        return self.field.to_python(value) if self.field is not None else value
+
+    def order_by(self, reverse: bool = False) -> OrderBy:
+        descending = self.descending != reverse
+        if not self.nullable:
+            return F(self.name).desc() if descending else F(self.name).asc()
+        nulls = {"nulls_last": True} if self.nulls_last != reverse else {"nulls_first": True}
+        return F(self.name).desc(**nulls) if descending else F(self.name).asc(**nulls)
+
+    def equal(self, value: Any) -> Q:
+        if value is None:
+            return Q(**{f"{self.name}__isnull": True})
+        return Q(**{self.name: value})
+
+    def after(self, value: Any, reverse: bool = False) -> Optional[Q]:
+        """Строки, идущие строго после ``value`` по этому полю (None — таких нет)."""
+        descending = self.descending != reverse
+        nulls_last = self.nulls_last != reverse
+        if value is None:
+            return None if nulls_last else Q(**{f"{self.name}__isnull": False})
+        condition = Q(**{f"{self.name}__{'lt' if descending else 'gt'}": value})
+        if self.nullable and nulls_last:
+            condition |= Q(**{f"{self.name}__isnull": True})
+        return condition
+
+    def bound(self, value: Any, reverse: bool = False) -> Optional[Q]:
+        """Избыточное условие на ведущее поле: даёт индексу границу диапазона."""
+        if value is None:
+            return None
+        descending = self.descending != reverse
+        condition = Q(**{f"{self.name}__{'lte' if descending else 'gte'}": value})
+        if self.nullable and self.nulls_last != reverse:
+            condition |= Q(**{f"{self.name}__isnull": True})
+        return condition
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Keyset pagination over an arbitrary ordering.
+
+    Unlike ``CursorPagination`` the cursor stores the values of every ordering
+    term of the boundary row (plus ``id`` as a tie-breaker), so a page is
+    fetched with a single ``WHERE (...) > (...) LIMIT n`` query: no ``OFFSET``
+    and no ``COUNT(*)``, whatever the depth.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    tiebreaker = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.terms = self.get_terms(queryset)
+        self.cursor = self.decode_cursor(request)
+        position = self._decode_position(self.cursor)
+        reverse = bool(position is not None and self.cursor.reverse)
+
+        queryset = queryset.order_by(*(term.order_by(reverse) for term in self.terms))
+        if position is not None:
+            queryset = queryset.filter(self._after_position(position, reverse))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_terms(self, queryset) -> List[KeysetTerm]:
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        terms = []
+        for item in ordering:
+            term = self._term_from_ordering(queryset.model, item)
+            if term is not None:
+                terms.append(term)
+        if not any(term.name in (self.tiebreaker, "pk") for term in terms):
+            descending = terms[-1].descending if terms else False
+            terms.append(KeysetTerm(self.tiebreaker, descending))
+        return [
+            KeysetTerm(
+                term.name,
+                term.descending,
+                nullable=term.nullable,
+                nulls_last=term.nulls_last,
+                field=_resolve_field(queryset, term.name),
+            )
+            for term in terms
+        ]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, instance, reverse: bool) -> str:
+        values = [_serialize(_lookup(instance, term.name)) for term in self.terms]
+        return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=json.dumps(values)))
+
+    def _decode_position(self, cursor) -> Optional[list]:
+        if cursor is None or cursor.position is None:
+            return None
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.terms):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [term.parse(value) for term, value in zip(self.terms, position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after_position(self, position: list, reverse: bool) -> Q:
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for term, value in zip(self.terms, position):
+            after = term.after(value, reverse)
+            if after is not None:
+                condition |= prefix & after
+            prefix &= term.equal(value)
+        bound = self.terms[0].bound(position[0], reverse)
+        if bound is not None:
+            condition &= bound
+        return condition
+
+    @staticmethod
+    def _term_from_ordering(model, item) -> Optional[KeysetTerm]:
+        if isinstance(item, str):
+            if item == "?":
+                return None
+            descending = item.startswith("-")
+            name = item.lstrip("-")
+            nulls_last = True
+            explicit_nulls = False
+        elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+            name = item.expression.name
+            descending = item.descending
+            explicit_nulls = bool(item.nulls_first or item.nulls_last)
+            nulls_last = not item.nulls_first
+        else:
+            return None
+        if name == "pk":
+            name = model._meta.pk.name
+        try:
+            nullable = model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            nullable = explicit_nulls
+        return KeysetTerm(name, descending, nullable=nullable, nulls_last=nulls_last)
+
+
+class SupplierPagination(StandardPagination):
+    """Постраничная навигация по номеру; keyset-курсор при наличии ``?cursor=``."""
+
+    cursor_pagination_class = KeysetCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def _resolve_field(queryset, name: str) -> Optional[Field]:
+    """Поле, по которому идёт сортировка: через связи ``a__b`` или из аннотации."""
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        try:
+            return annotation.output_field
+        except FieldError:
+            return None
+    opts = queryset.model._meta
+    resolved = None
+    for part in name.split("__"):
+        if opts is None:
+            return None
+        try:
+            resolved = opts.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        opts = resolved.related_model._meta if resolved.is_relation and resolved.related_model else None
+    if resolved is not None and resolved.is_relation:
+        # В курсоре лежит ключ связанной строки
+        return getattr(resolved, "target_field", None)
+    return resolved
+
+
+def _lookup(instance, name: str) -> Any:
+    value = instance
+    for part in name.split("__"):
+        value = getattr(value, part, None)
+    return value
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from apps.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def verification_group(supplier_id: int) -> str:
+    return f"supplier_verification_{supplier_id}"
+
+
+def publish_verification_event(supplier_id: int, event: str, **data: Any) -> None:
+    """
+    Sends a verification event to the supplier's Channels group.
+
+    Best effort: the verification itself must not fail because the channel
+    layer is unreachable.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message: Dict[str, Any] = {"event": event, "supplier_id": supplier_id, **data}
+    try:
+        async_to_sync(channel_layer.group_send)(
+            verification_group(supplier_id),
+            {"type": "verification_event", "message": message},
+        )
+    except Exception as exc:
+        logger.debug("Verification event for supplier %s not published: %s", supplier_id, exc)
+
+
+def publish_source_result(supplier_id: int, check_id: int, source: str, result: Dict[str, Any]) -> None:
+    publish_verification_event(
+        supplier_id,
+        "source",
+        check_id=check_id,
+        source=source,
+        status=result.get("status"),
+        score=result.get("score"),
+    )
+
+
+def publish_check_finished(check) -> None:
+    publish_verification_event(
+        check.supplier_id,
+        check.status,
+        check_id=check.id,
+        overall_score=str(check.overall_score) if check.overall_score is not None else None,
+        risk_level=check.risk_level,
+        is_verified=check.is_verified,
+        error_message=check.error_message,
+    )
+
+
+class BatchProgress:
+    """
+    Counters of a batch verification in a Redis hash ``verification:batch:{id}``.
+
+    Fields: ``queued``, ``running``, ``succeeded``, ``failed``, ``skipped``
+    (locked or deleted suppliers), ``fallback:{source}`` (registry answered
+    with a mock or timed out) and ``dispatch_complete``. Updates are applied
+    in one MULTI/EXEC, reads are a single ``HGETALL``. Redis failures are
+    logged and ignored.
+    """
+
+    KEY_PREFIX = "verification:batch"
+    COUNTERS = ("queued", "running", "succeeded", "failed", "skipped")
+
+    def __init__(self, batch_id: str):
+        self.batch_id = batch_id
+        self.key = f"{self.KEY_PREFIX}:{batch_id}"
+        self.ttl = getattr(settings, "VERIFICATION_BATCH_PROGRESS_TTL", 7 * 24 * 60 * 60)
+
+    def increment(self, **counters: int) -> None:
+        self._update({name: amount for name, amount in counters.items() if amount})
+
+    def record_fallbacks(self, sources: Counter) -> None:
+        self._update({f"fallback:{source}": count for source, count in sources.items() if count})
+
+    def mark_dispatch_complete(self) -> None:
+        self._update({"dispatch_complete": 1})
+
+    def status(self) -> Optional[Dict[str, Any]]:
+        try:
+            raw = get_redis().hgetall(self.key)
+        except redis.RedisError as exc:
+            logger.debug("Batch progress unavailable: %s", exc)
+            return None
+        if not raw:
+            return None
+        status: Dict[str, Any] = {"batch_id": self.batch_id}
+        status.update({name: int(raw.get(name, 0)) for name in self.COUNTERS})
+        status["fallbacks"] = {
+            field.split(":", 1)[1]: int(value)
+            for field, value in raw.items()
+            if field.startswith("fallback:")
+        }
+        processed = status["succeeded"] + status["failed"] + status["skipped"]
+        status["finished"] = bool(int(raw.get("dispatch_complete", 0))) and processed >= status["queued"]
+        return status
+
+    def _update(self, fields: Dict[str, int]) -> None:
+        if not fields:
+            return
+        try:
+            pipeline = get_redis().pipeline(transaction=True)
+            for field, amount in fields.items():
+                pipeline.hincrby(self.key, field, amount)
+            pipeline.expire(self.key, self.ttl)
+            pipeline.execute()
+        except redis.RedisError as exc:
+            logger.debug("Batch progress unavailable: %s", exc)
+
+
+def is_fallback(result: Dict[str, Any]) -> bool:
+    """Реестр не ответил: результат подставлен из mock или отсечён по таймауту"""
+    return result.get("status") == "timeout" or bool((result.get("payload") or {}).get("mock"))
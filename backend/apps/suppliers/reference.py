@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from apps.utils.reference_cache import ReferenceCache
+
+from .models import Category, Country, LogisticsCompany
+
+reference_data = ReferenceCache()
+
+
+def load_categories() -> Dict[str, Any]:
+    rows = list(
+        Category.objects.order_by("depth", "name", "id").values(
+            "id", "name", "slug", "icon", "full_name", "parent_id", "path"
+        )
+    )
+    return {
+        "by_id": {row["id"]: row for row in rows},
+        "by_slug": {row["slug"]: row for row in rows},
+        "tree": build_category_tree(rows),
+    }
+
+
+def build_category_tree(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Вложенное дерево из строк, отсортированных по depth (родитель раньше детей)"""
+    nodes: Dict[int, Dict[str, Any]] = {}
+    roots: List[Dict[str, Any]] = []
+    for row in rows:
+        node = {
+            "id": row["id"],
+            "name": row["name"],
+            "slug": row["slug"],
+            "icon": row["icon"],
+            "full_path": row["full_name"] or row["name"],
+            "children": [],
+        }
+        nodes[row["id"]] = node
+        parent = nodes.get(row["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+    return roots
+
+
+def load_logistics() -> List[Dict[str, Any]]:
+    return list(LogisticsCompany.objects.values("id", "name", "site", "description"))
+
+
+def load_countries() -> Dict[str, Any]:
+    rows = list(Country.objects.values("id", "code", "name"))
+    by_key: Dict[str, List[int]] = {}
+    for row in rows:
+        by_key.setdefault(row["name"], []).append(row["id"])
+        if row["code"]:
+            by_key.setdefault(row["code"], []).append(row["id"])
+    return {"by_id": {row["id"]: row for row in rows}, "by_key": by_key}
+
+
+reference_data.register("categories", load_categories)
+reference_data.register("logistics", load_logistics)
+reference_data.register("countries", load_countries)
+
+
+def category_tree() -> List[Dict[str, Any]]:
+    return reference_data.get("categories")["tree"]
+
+
+def category_subtree_ids(slug: str) -> Optional[List[int]]:
+    """id категории и всех её потомков, ``None`` — категории нет"""
+    categories = reference_data.get("categories")
+    root = categories["by_slug"].get(slug)
+    if root is None:
+        return None
+    prefix = root["path"] or f"{root['id']}/"
+    return [row["id"] for row in categories["by_id"].values() if (row["path"] or "").startswith(prefix)]
+
+
+def logistics_companies() -> List[Dict[str, Any]]:
+    return reference_data.get("logistics")
+
+
+def country(country_id: int) -> Optional[Dict[str, Any]]:
+    countries = reference_data.get("countries")["by_id"]
+    if country_id not in countries:
+        # Страна могла появиться после загрузки, а сообщение об этом — ещё не дойти
+        reference_data.invalidate_local("countries")
+        countries = reference_data.get("countries")["by_id"]
+    return countries.get(country_id)
+
+
+def country_ids(value: str) -> List[int]:
+    """Страны с таким ISO-кодом (без учёта регистра) или точным названием"""
+    by_key = reference_data.get("countries")["by_key"]
+    return sorted(set(by_key.get(value.upper(), []) + by_key.get(value, [])))
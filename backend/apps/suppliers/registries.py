@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from apps.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT: Tuple[float, float] = (3.05, 30)
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+# Ключи API не участвуют в ключе кэша: одинаковый запрос с разными ключами — один ответ
+SECRET_PARAMS = frozenset({"token", "apiKey", "key"})
+
+_client: Optional["RegistryClient"] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+class RegistryClient:
+    """
+    Keep-alive HTTP client shared by all registry lookups of one process.
+
+    Connections are pooled per host (``REGISTRY_POOL_MAXSIZE`` each, blocking
+    when exhausted), so batch verification reuses TCP/TLS sessions instead
+    of paying a handshake per request. Connect/read timeouts come from
+    ``REGISTRY_TIMEOUTS`` per source.
+    """
+
+    def __init__(self):
+        self.timeouts: Dict[str, Tuple[float, float]] = {
+            source: tuple(timeout)
+            for source, timeout in getattr(settings, "REGISTRY_TIMEOUTS", {}).items()
+        }
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=getattr(settings, "REGISTRY_POOL_CONNECTIONS", 10),
+            pool_maxsize=getattr(settings, "REGISTRY_POOL_MAXSIZE", 8),
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if not getattr(settings, "REGISTRY_GZIP", True):
+            self.session.headers["Accept-Encoding"] = "identity"
+
+    def get(self, source: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.session.get(url, params=params, timeout=self.timeout_for(source))
+        response.raise_for_status()
+        return response.json()
+
+    def timeout_for(self, source: str) -> Tuple[float, float]:
+        return self.timeouts.get(source, DEFAULT_TIMEOUT)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def get_registry_client() -> RegistryClient:
+    """Returns the client of the current process (re-created after a fork)."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = RegistryClient()
+                _client_pid = pid
+    return _client
+
+
+class RegistryUnavailable(Exception):
+    """Registry failed recently; raised from the negative cache instead of calling it again."""
+
+
+class RegistryResponseCache:
+    """
+    Redis cache of registry responses shared by all workers.
+
+    Keys are derived from the source and its normalized query parameters, so
+    re-verification waves and suppliers sharing an INN hit the same entry.
+    Errors are cached for ``REGISTRY_CACHE_ERROR_TTL`` seconds. Hit/miss
+    counters per source are kept in a Redis hash (see ``stats``). Redis
+    failures degrade to cache misses.
+    """
+
+    KEY_PREFIX = "registry:response"
+    STATS_KEY = "registry:response:stats"
+
+    def key(self, source: str, params: Dict[str, Any]) -> str:
+        normalized = sorted(
+            (name, str(value).strip().lower())
+            for name, value in params.items()
+            if name not in SECRET_PARAMS
+        )
+        digest = hashlib.sha256(json.dumps(normalized, ensure_ascii=False).encode()).hexdigest()
+        return f"{self.KEY_PREFIX}:{source}:{digest}"
+
+    def get(self, source: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the cached payload, ``None`` on a miss; raises ``RegistryUnavailable`` for a cached error."""
+        try:
+            client = get_redis()
+            raw = client.get(self.key(source, params))
+            client.hincrby(self.STATS_KEY, f"{source}:{'hits' if raw is not None else 'misses'}", 1)
+        except redis.RedisError as exc:
+            logger.debug("Registry cache unavailable: %s", exc)
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if "error" in entry:
+            raise RegistryUnavailable(entry["error"])
+        return entry["payload"]
+
+    def set(self, source: str, params: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        ttl = getattr(settings, "REGISTRY_CACHE_TTL", {}).get(source, DEFAULT_CACHE_TTL)
+        self._write(source, params, {"payload": payload}, ttl)
+
+    def set_error(self, source: str, params: Dict[str, Any], error: str) -> None:
+        ttl = getattr(settings, "REGISTRY_CACHE_ERROR_TTL", 5 * 60)
+        self._write(source, params, {"error": error}, ttl)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        try:
+            raw = get_redis().hgetall(self.STATS_KEY)
+        except redis.RedisError as exc:
+            logger.debug("Registry cache unavailable: %s", exc)
+            raw = {}
+        stats: Dict[str, Dict[str, int]] = {}
+        for field, value in raw.items():
+            source, counter = field.split(":", 1)
+            stats.setdefault(source, {"hits": 0, "misses": 0})[counter] = int(value)
+        return stats
+
+    def _write(self, source: str, params: Dict[str, Any], entry: Dict[str, Any], ttl: int) -> None:
+        if ttl <= 0:
+            return
+        try:
+            get_redis().set(self.key(source, params), json.dumps(entry, ensure_ascii=False), ex=ttl)
+        except redis.RedisError as exc:
+            logger.debug("Registry cache unavailable: %s", exc)
+
+
+class CircuitBreaker:
+    """
+    Per-source circuit breaker whose state lives in Redis, shared by all workers.
+
+    After ``REGISTRY_BREAKER_FAILURE_THRESHOLD`` consecutive failures within
+    ``REGISTRY_BREAKER_WINDOW`` seconds the breaker opens and calls fail fast
+    for ``REGISTRY_BREAKER_COOLDOWN`` seconds. Then a single probe request is
+    let through (half-open): success closes the breaker, failure re-opens it.
+    If Redis is unreachable the breaker stays closed.
+    """
+
+    KEY_PREFIX = "registry:breaker"
+
+    def __init__(self, source: str):
+        self.source = source
+        prefix = f"{self.KEY_PREFIX}:{source}"
+        self.failures_key = f"{prefix}:failures"
+        self.open_key = f"{prefix}:open"
+        self.tripped_key = f"{prefix}:tripped"
+        self.probe_key = f"{prefix}:probe"
+        self.threshold = getattr(settings, "REGISTRY_BREAKER_FAILURE_THRESHOLD", 5)
+        self.window = getattr(settings, "REGISTRY_BREAKER_WINDOW", 60)
+        self.cooldown = getattr(settings, "REGISTRY_BREAKER_COOLDOWN", 30)
+
+    def allow_request(self) -> bool:
+        try:
+            client = get_redis()
+            if client.exists(self.open_key):
+                return False
+            if client.exists(self.tripped_key):
+                # Half-open: пропускаем ровно один пробный запрос
+                return bool(client.set(self.probe_key, "1", nx=True, ex=self.cooldown))
+        except redis.RedisError as exc:
+            logger.debug("Circuit breaker state unavailable: %s", exc)
+        return True
+
+    def record_success(self) -> None:
+        try:
+            get_redis().delete(self.failures_key, self.tripped_key, self.probe_key)
+        except redis.RedisError as exc:
+            logger.debug("Circuit breaker state unavailable: %s", exc)
+
+    def record_failure(self) -> None:
+        try:
+            client = get_redis()
+            if client.exists(self.tripped_key):
+                self._open(client)
+                return
+            failures = client.incr(self.failures_key)
+            if failures == 1:
+                client.expire(self.failures_key, self.window)
+            if failures >= self.threshold:
+                self._open(client)
+        except redis.RedisError as exc:
+            logger.debug("Circuit breaker state unavailable: %s", exc)
+
+    def _open(self, client: redis.Redis) -> None:
+        logger.warning("Circuit breaker for %s is open for %ss", self.source, self.cooldown)
+        client.set(self.open_key, "1", ex=self.cooldown)
+        client.set(self.tripped_key, "1")
+        client.delete(self.failures_key, self.probe_key)
+
+
+class RateLimiter:
+    """
+    Distributed token bucket per source (``REGISTRY_RATE_LIMITS``: rate per second, burst).
+
+    ``acquire`` waits for a token up to ``REGISTRY_RATE_LIMIT_MAX_WAIT``
+    seconds and returns ``False`` if none becomes available in time. The
+    bucket is refilled atomically by a Lua script against the Redis clock.
+    """
+
+    KEY_PREFIX = "registry:bucket"
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.key = f"{self.KEY_PREFIX}:{source}"
+        self.limit = getattr(settings, "REGISTRY_RATE_LIMITS", {}).get(source)
+        self.max_wait = getattr(settings, "REGISTRY_RATE_LIMIT_MAX_WAIT", 5)
+
+    def acquire(self) -> bool:
+        if not self.limit:
+            return True
+        rate, burst = self.limit
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            try:
+                wait = float(get_redis().eval(self.SCRIPT, 1, self.key, rate, burst))
+            except redis.RedisError as exc:
+                logger.debug("Rate limiter state unavailable: %s", exc)
+                return True
+            if wait <= 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+def is_registry_failure(exc: Exception) -> bool:
+    """Errors that say the registry is unhealthy (not that the request was wrong)."""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, Type
+
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+
+from .models import Supplier
+
+FTS_TABLE = "suppliers_supplier_fts"
+SEARCH_CONFIGS = ("russian", "english")
+REINDEX_CHUNK_SIZE = 500
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_search_document(supplier: Supplier) -> str:
+    """
+    Collects everything a supplier can be found by, except the name which is
+    indexed separately with a higher weight. Only fields are read, so
+    historical models of a data migration work as well.
+    """
+    parts = [supplier.description, supplier.country.name, supplier.city.name]
+    if supplier.category_id:
+        parts.append(_category_path(supplier.category))
+    parts.extend(_category_path(category) for category in supplier.additional_categories.all())
+    parts.extend(company.name for company in supplier.logistics_options.all())
+    return " ".join(part for part in parts if part)
+
+
+class SupplierSearchIndex:
+    """
+    Full-text index over suppliers.
+
+    PostgreSQL keeps a generated ``search_vector`` column (russian + english
+    stemming, GIN index) in sync with ``name`` and ``search_document``.
+    SQLite mirrors the same two columns into an FTS5 table ranked with bm25.
+    Both are created by migration ``0002_supplier_search_document``.
+    """
+
+    @classmethod
+    def update(cls, supplier_ids: Iterable[int], model: Type[Supplier] = Supplier) -> int:
+        """Rebuilds the documents of the given suppliers; ``model`` — a historical model in migrations."""
+        ids = list(supplier_ids)
+        updated = 0
+        for start in range(0, len(ids), REINDEX_CHUNK_SIZE):
+            chunk = ids[start:start + REINDEX_CHUNK_SIZE]
+            suppliers = list(
+                model.objects.filter(pk__in=chunk)
+                .select_related("category", "country", "city")
+                .prefetch_related("additional_categories", "logistics_options")
+            )
+            changed = []
+            for supplier in suppliers:
+                document = build_search_document(supplier)
+                if document != supplier.search_document:
+                    supplier.search_document = document
+                    changed.append(supplier)
+            if changed:
+                model.objects.bulk_update(changed, ["search_document"])
+            if connection.vendor == "sqlite":
+                cls._sync_fts(suppliers)
+            updated += len(changed)
+        return updated
+
+    @classmethod
+    def rebuild(cls) -> int:
+        ids = Supplier.objects.order_by("pk").values_list("pk", flat=True).iterator()
+        return cls.update(ids)
+
+    @classmethod
+    def remove(cls, supplier_ids: Iterable[int]) -> None:
+        if connection.vendor != "sqlite":
+            return
+        ids = list(supplier_ids)
+        if not ids:
+            return
+        placeholders = ", ".join(["%s"] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", ids)
+
+    @classmethod
+    def search(cls, queryset: models.QuerySet, query: str) -> models.QuerySet:
+        """Filters ``queryset`` by ``query`` and annotates it with ``search_rank``."""
+        if connection.vendor == "postgresql":
+            return cls._search_postgres(queryset, query)
+        if connection.vendor == "sqlite":
+            return cls._search_sqlite(queryset, query)
+        return cls._search_fallback(queryset, query)
+
+    @staticmethod
+    def _search_postgres(queryset: models.QuerySet, query: str) -> models.QuerySet:
+        tsquery = " || ".join(
+            f"websearch_to_tsquery('{config}', %s)" for config in SEARCH_CONFIGS
+        )
+        params = (query,) * len(SEARCH_CONFIGS)
+        return queryset.filter(
+            RawSQL(
+                f'"suppliers_supplier"."search_vector" @@ ({tsquery})',
+                params,
+                output_field=models.BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'ts_rank_cd("suppliers_supplier"."search_vector", {tsquery})',
+                params,
+                output_field=models.FloatField(),
+            )
+        )
+
+    @staticmethod
+    def _search_sqlite(queryset: models.QuerySet, query: str) -> models.QuerySet:
+        match = _fts5_match_expression(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(
+            RawSQL(
+                f'"suppliers_supplier"."id" IN '
+                f"(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+                (match,),
+                output_field=models.BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = "suppliers_supplier"."id")',
+                (match,),
+                output_field=models.FloatField(),
+            )
+        )
+
+    @staticmethod
+    def _search_fallback(queryset: models.QuerySet, query: str) -> models.QuerySet:
+        condition = models.Q()
+        for token in _TOKEN_RE.findall(query):
+            condition &= models.Q(name__icontains=token) | models.Q(search_document__icontains=token)
+        return queryset.filter(condition).annotate(
+            search_rank=models.Value(0.0, output_field=models.FloatField())
+        )
+
+    @staticmethod
+    def _sync_fts(suppliers: List[Supplier]) -> None:
+        if not suppliers:
+            return
+        ids = [supplier.pk for supplier in suppliers]
+        placeholders = ", ".join(["%s"] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", ids)
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, document) VALUES (%s, %s, %s)",
+                [(supplier.pk, supplier.name, supplier.search_document) for supplier in suppliers],
+            )
+
+
+def _category_path(category) -> str:
+    # То же, что Category.get_full_path(), без вызова метода модели
+    return category.full_name or category.name
+
+
+def _fts5_match_expression(query: str) -> str:
+    # Каждое слово — префиксный поиск: в FTS5 нет русского стеммера
+    tokens = _TOKEN_RE.findall(query.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
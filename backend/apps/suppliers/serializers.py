@@ -1,5 +1,6 @@
+from django.db.models import Count, Q
 from rest_framework import serializers
-from .models import Supplier, Category, LogisticsCompany, VerificationCheck
+from .models import Supplier, Category, LogisticsCompany, VerificationCheck, VerificationPayload
 
 class CategorySerializer(serializers.ModelSerializer):
     supplier_count = serializers.SerializerMethodField()
@@ -9,14 +10,25 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slug", "supplier_count"]
     
     def get_supplier_count(self, obj):
+        # Аннотация из with_supplier_count(); без неё — запрос на строку
+        if hasattr(obj, "active_supplier_count"):
+            return obj.active_supplier_count
         return obj.suppliers.filter(is_active=True).count()
 
+    @staticmethod
+    def with_supplier_count(queryset):
+        return queryset.annotate(
+            active_supplier_count=Count("suppliers", filter=Q(suppliers__is_active=True))
+        )
+
 class LogisticsSerializer(serializers.ModelSerializer):
     class Meta:
         model = LogisticsCompany
         fields = ["id", "name", "site", "description"]
 
 class VerificationCheckSerializer(serializers.ModelSerializer):
+    country = serializers.CharField(source="country.name", read_only=True)
+
     class Meta:
         model = VerificationCheck
         fields = [
@@ -40,11 +52,40 @@ class VerificationCheckSerializer(serializers.ModelSerializer):
         ]
 
 
+class VerificationCheckDetailSerializer(VerificationCheckSerializer):
+    """Проверка вместе с сырыми ответами реестров (только для детального запроса)"""
+    payloads = serializers.SerializerMethodField()
+
+    class Meta(VerificationCheckSerializer.Meta):
+        fields = VerificationCheckSerializer.Meta.fields + ["payloads"]
+
+    def get_payloads(self, obj):
+        refs = {
+            source: result["payload_ref"]
+            for source, result in (obj.checked_sources or {}).items()
+            if isinstance(result, dict) and result.get("payload_ref")
+        }
+        loaded = VerificationPayload.load_many(refs.values())
+        return {source: loaded.get(ref) for source, ref in refs.items()}
+
+
 class SupplierSerializer(serializers.ModelSerializer):
+    """
+    ``fields`` — набор выводимых полей (None — все), ``expand`` — связи,
+    выводимые вложенными объектами (None — все); остальные связи выводятся
+    как ID.
+    """
+    EXPANDABLE = ("category", "logistics_options", "latest_check")
+    # Поля модели, которые нужны вычисляемым полям
+    FIELD_SOURCES = {"logo_url": ("logo",), "country_code": ("country",)}
+
+    country = serializers.CharField(source="country.name", read_only=True)
+    country_code = serializers.CharField(source="country.code", read_only=True)
+    city = serializers.CharField(source="city.name", read_only=True)
     category = CategorySerializer(read_only=True)
     logistics_options = LogisticsSerializer(read_only=True, many=True)
     logo_url = serializers.SerializerMethodField()
-    latest_check = serializers.SerializerMethodField()
+    latest_check = VerificationCheckSerializer(read_only=True)
 
     class Meta:
         model = Supplier
@@ -52,6 +93,7 @@ class SupplierSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "country",
+            "country_code",
             "city",
             "description",
             "logo",
@@ -70,13 +112,19 @@ class SupplierSerializer(serializers.ModelSerializer):
             "created_at",
         ]
 
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None:
+            for name in set(self.EXPANDABLE) - set(expand):
+                if name in self.fields:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(
+                        read_only=True, many=name == "logistics_options"
+                    )
+
     def get_logo_url(self, obj):
         if obj.logo:
             return obj.logo.url
         return None
-
-    def get_latest_check(self, obj):
-        check = obj.verification_checks.order_by("-created_at").first()
-        if not check:
-            return None
-        return VerificationCheckSerializer(check).data
@@ -1,28 +1,63 @@
 from __future__ import annotations
 
+import hashlib
 import logging
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
-import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
 
-from .models import Supplier
+from . import reference
+from .caching import LIST_TAG, ResponseCache, invalidate_suppliers
+from .models import Supplier, VerificationCheck, VerificationPayload, VerificationStatus
+from .registries import (
+    CircuitBreaker,
+    RateLimiter,
+    RegistryResponseCache,
+    RegistryUnavailable,
+    get_registry_client,
+    is_registry_failure,
+)
 
 logger = logging.getLogger(__name__)
 
 
+# Реестры лицензий по ISO-коду страны поставщика
+LICENSE_REGISTRIES = {
+    "CN": "https://api.qcc.com/api/company/getDetail",
+    "TR": "https://api.mersis.gov.tr/v1/companies",
+    "IN": "https://api.mca.gov.in/company",
+    "RU": "https://api-minpromtorg.gov.ru/licences",
+}
+DEFAULT_LICENSE_REGISTRY = "https://api.oecd-ilibrary.org/mock"
+
+
 class VerificationService:
     """
     Service that aggregates supplier verification checks against public registries.
 
     Uses real endpoints for ФССП, РНП и ЕГРЮЛ when API-keys are configured.
     Falls back to deterministic mock responses in development environments.
+
+    Registries are queried concurrently under one overall deadline; sources
+    that miss it are reported with ``status="timeout"`` and no score, so the
+    check is scored on the sources that did answer.
     """
 
-    TIMEOUT = 30
+    SOURCES = ("fssp", "rnp", "egrul", "licenses")
 
     def __init__(self, supplier: Supplier):
         self.supplier = supplier
+        # Страна из справочника процесса: без JOIN и запроса на поставщика
+        self.country = reference.country(supplier.country_id)
+        self.response_cache = RegistryResponseCache()
+        self.deadline = getattr(settings, "VERIFICATION_DEADLINE_SECONDS", 40)
         self.mock_mode = not all(
             [
                 getattr(settings, "FSSP_API_KEY", None),
@@ -31,24 +66,45 @@ class VerificationService:
             ]
         )
 
-    def check_all(self) -> Dict[str, Any]:
-        fssp = self.check_fssp()
-        rnp = self.check_rnp()
-        egrul = self.check_egrul()
-        licenses = self.check_licenses()
+    def check_all(self, on_result: Callable[[str, Dict[str, Any]], None] | None = None) -> Dict[str, Any]:
+        """
+        Queries all sources; ``on_result(source, result)`` is called in the
+        calling thread as each source answers (or times out).
+        """
+        checks: Dict[str, Callable[[], Dict[str, Any]]] = {
+            "fssp": self.check_fssp,
+            "rnp": self.check_rnp,
+            "egrul": self.check_egrul,
+            "licenses": self.check_licenses,
+        }
+        results: Dict[str, Dict[str, Any]] = {}
+        executor = ThreadPoolExecutor(max_workers=len(checks), thread_name_prefix="verification")
+        futures = {executor.submit(check): source for source, check in checks.items()}
+        try:
+            for future in as_completed(futures, timeout=self.deadline):
+                source = futures[future]
+                results[source] = future.result()
+                if on_result is not None:
+                    on_result(source, results[source])
+        except FuturesTimeoutError:
+            for source in checks:
+                if source not in results:
+                    logger.warning(
+                        "Verification source %s missed the %ss deadline for supplier %s",
+                        source,
+                        self.deadline,
+                        self.supplier.id,
+                    )
+                    results[source] = self._timeout_payload(source)
+                    if on_result is not None:
+                        on_result(source, results[source])
+        finally:
+            # Не ждём зависшие реестры: их потоки завершатся по собственному таймауту
+            executor.shutdown(wait=False, cancel_futures=True)
+
         return {
-            "sources": {
-                "fssp": fssp,
-                "rnp": rnp,
-                "egrul": egrul,
-                "licenses": licenses,
-            },
-            "scores": {
-                "fssp_score": fssp["score"],
-                "rnp_score": rnp["score"],
-                "egrul_score": egrul["score"],
-                "licenses_score": licenses["score"],
-            },
+            "sources": {source: results[source] for source in self.SOURCES},
+            "scores": {f"{source}_score": results[source]["score"] for source in self.SOURCES},
         }
 
     def check_fssp(self) -> Dict[str, Any]:
@@ -64,7 +120,7 @@ class VerificationService:
         endpoint = "https://zakupki.gov.ru/epz/eruz/eruzRest/eruzSupplier/load"
         params = {
             "inn": self._safe_inn(),
-            "country": self.supplier.country,
+            "country": self.country["name"],
             "apiKey": getattr(settings, "NEWDB_API_KEY", ""),
         }
         return self._safe_fetch("rnp", endpoint, params)
@@ -78,22 +134,16 @@ class VerificationService:
         return self._safe_fetch("egrul", endpoint, params)
 
     def check_licenses(self) -> Dict[str, Any]:
-        registry_map = {
-            "Китай": "https://api.qcc.com/api/company/getDetail",
-            "Турция": "https://api.mersis.gov.tr/v1/companies",
-            "Индия": "https://api.mca.gov.in/company",
-            "Россия": "https://api-minpromtorg.gov.ru/licences",
-        }
-        endpoint = registry_map.get(self.supplier.country, "https://api.oecd-ilibrary.org/mock")
+        endpoint = LICENSE_REGISTRIES.get(self.country["code"], DEFAULT_LICENSE_REGISTRY)
         params = {
             "name": self.supplier.name,
-            "country": self.supplier.country,
+            "country": self.country["name"],
         }
         return self._safe_fetch("licenses", endpoint, params)
 
     def _safe_fetch(self, source: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            payload = self._request(url, params)
+            payload = self._fetch(source, url, params)
             infra_score = self._score_from_payload(payload)
             return {
                 "source": source,
@@ -106,12 +156,38 @@ class VerificationService:
             mock_payload = self._mock_payload(source)
             return mock_payload
 
-    def _request(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _fetch(self, source: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.mock_mode:
+            return self._request(source, url, params)
+        payload = self.response_cache.get(source, params)
+        if payload is not None:
+            return payload
+        try:
+            payload = self._request(source, url, params)
+        except RegistryUnavailable:
+            raise
+        except Exception as exc:
+            self.response_cache.set_error(source, params, str(exc))
+            raise
+        self.response_cache.set(source, params, payload)
+        return payload
+
+    def _request(self, source: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
         if self.mock_mode:
             raise RuntimeError("Mock mode enabled")
-        response = requests.get(url, params=params, timeout=self.TIMEOUT)
-        response.raise_for_status()
-        return response.json()
+        breaker = CircuitBreaker(source)
+        if not breaker.allow_request():
+            raise RegistryUnavailable(f"Circuit breaker for {source} is open")
+        if not RateLimiter(source).acquire():
+            raise RegistryUnavailable(f"Rate limit for {source} exhausted")
+        try:
+            payload = get_registry_client().get(source, url, params)
+        except Exception as exc:
+            if is_registry_failure(exc):
+                breaker.record_failure()
+            raise
+        breaker.record_success()
+        return payload
 
     def _score_from_payload(self, payload: Dict[str, Any]) -> float:
         issues = payload.get("issues") or payload.get("result") or []
@@ -135,12 +211,246 @@ class VerificationService:
             "score": score,
             "payload": {
                 "mock": True,
-                "country": self.supplier.country,
+                "country": self.country["name"],
                 "supplier": self.supplier.name,
             },
         }
 
+    def _timeout_payload(self, source: str) -> Dict[str, Any]:
+        return {
+            "source": source,
+            "status": "timeout",
+            "score": None,
+            "payload": {},
+        }
+
     def _safe_inn(self) -> str:
         digits = "".join(filter(str.isdigit, self.supplier.contact_phone or ""))
         return (digits or "7707083893")[:10]
 
+
+class VerificationResultBuffer:
+    """
+    Writes the verification outcomes of a chunk of suppliers in bulk.
+
+    ``start`` inserts the in-progress checks and re-points the suppliers at
+    them in one transaction; ``complete``/``fail`` only change objects in
+    memory and queue them; ``flush`` stores the new raw registry payloads
+    (deduplicated by hash, see ``VerificationPayload``) and writes the queued
+    checks and suppliers with two ``bulk_update`` statements in one
+    transaction. It may be called repeatedly, each call writes only what was
+    finished since the previous one. Scoring goes through
+    ``VerificationCheck.calculate_overall_score`` and
+    ``Supplier.set_verification_result``, exactly as the per-row path.
+    """
+
+    CHECK_FIELDS = [
+        "status",
+        "checked_sources",
+        "fssp_score",
+        "rnp_score",
+        "egrul_score",
+        "licenses_score",
+        "overall_score",
+        "is_verified",
+        "risk_level",
+        "error_message",
+        "completed_at",
+        "updated_at",
+    ]
+    SUPPLIER_FIELDS = Supplier.VERIFICATION_RESULT_FIELDS + ["updated_at"]
+
+    def __init__(self):
+        self.checks: List[VerificationCheck] = []
+        self.pending: List[VerificationCheck] = []
+        self.payloads: List[VerificationPayload] = []
+
+    def start(self, suppliers: List[Supplier]) -> List[VerificationCheck]:
+        now = timezone.now()
+        checks = [
+            VerificationCheck(
+                supplier=supplier,
+                country_id=supplier.country_id,
+                status=VerificationStatus.IN_PROGRESS,
+            )
+            for supplier in suppliers
+        ]
+        with transaction.atomic():
+            VerificationCheck.objects.bulk_create(checks)
+            for check in checks:
+                check.supplier.verification_status = VerificationStatus.IN_PROGRESS
+                check.supplier.latest_check = check
+                check.supplier.updated_at = now
+            Supplier.objects.bulk_update(
+                suppliers, ["verification_status", "latest_check", "updated_at"]
+            )
+        invalidate_suppliers(supplier.pk for supplier in suppliers)
+        self.checks = checks
+        return checks
+
+    def complete(self, check: VerificationCheck, payload: Dict[str, Any]) -> None:
+        scores = {name: _to_score(value) for name, value in payload["scores"].items()}
+        check.checked_sources, payloads = VerificationPayload.split_sources(payload["sources"])
+        self.payloads.extend(payloads)
+        check.fssp_score = scores["fssp_score"]
+        check.rnp_score = scores["rnp_score"]
+        check.egrul_score = scores["egrul_score"]
+        check.licenses_score = scores["licenses_score"]
+        check.status = VerificationStatus.COMPLETED
+        check.completed_at = timezone.now()
+        check.calculate_overall_score()
+        check.supplier.set_verification_result(check)
+        self.pending.append(check)
+
+    def fail(self, check: VerificationCheck, error: Exception | str) -> None:
+        check.status = VerificationStatus.FAILED
+        check.error_message = str(error)
+        check.completed_at = timezone.now()
+        check.supplier.verification_status = VerificationStatus.FAILED
+        check.supplier.is_verified = False
+        self.pending.append(check)
+
+    def flush(self) -> List[VerificationCheck]:
+        """Writes the checks finished since the last flush and returns them."""
+        checks, self.pending = self.pending, []
+        payloads, self.payloads = self.payloads, []
+        if not checks:
+            return checks
+        now = timezone.now()
+        for check in checks:
+            check.updated_at = now
+            check.supplier.updated_at = now
+        with transaction.atomic():
+            VerificationPayload.store(payloads)
+            VerificationCheck.objects.bulk_update(checks, self.CHECK_FIELDS)
+            Supplier.objects.bulk_update([check.supplier for check in checks], self.SUPPLIER_FIELDS)
+        invalidate_suppliers(check.supplier_id for check in checks)
+        return checks
+
+
+def _to_score(value: Any) -> Decimal | None:
+    # Реестры отдают float, а calculate_overall_score считает в Decimal
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+class CategoryTreeService:
+    """
+    Nested category hierarchy served from the in-process reference cache.
+
+    The tree is built together with the ``categories`` reference table from
+    a single query and dropped in every process whenever a ``Category`` is
+    saved or deleted (see ``signals.invalidate_reference_data``).
+    """
+
+    @classmethod
+    def get_tree(cls) -> List[Dict[str, Any]]:
+        return reference.category_tree()
+
+
+class SupplierFacetService:
+    """
+    Facet counts (country, city, category, verification status, premium) for a filtered queryset.
+
+    On PostgreSQL all facets come from a single scan of the filtered queryset
+    grouped by ``GROUPING SETS`` (one set per facet). The ORM cannot express
+    grouping sets and SQLite lacks them, so other backends fall back to one
+    ``UNION ALL`` of per-facet ``GROUP BY`` queries: still one round trip,
+    but one scan per facet. Results are cached per filter signature under
+    the ``suppliers`` response-cache tag, so any supplier change invalidates
+    them together with the list pages.
+    """
+
+    FACETS = {
+        "country": ("country", "country__name"),
+        "city": ("city", "city__name"),
+        "category": ("category__slug", "category__name"),
+        "verification_status": ("verification_status", "verification_status"),
+        "is_premium": ("is_premium", "is_premium"),
+    }
+    CACHE_PREFIX = "suppliers:facets"
+
+    @classmethod
+    def get_facets(cls, queryset, signature: str) -> Dict[str, List[Dict[str, Any]]]:
+        version = ResponseCache.versions([LIST_TAG])[LIST_TAG]
+        digest = hashlib.sha256(f"{signature}|{version}".encode()).hexdigest()
+        key = f"{cls.CACHE_PREFIX}:{digest}"
+        facets = cache.get(key)
+        if facets is None:
+            facets = cls.build_facets(queryset)
+            cache.set(key, facets, getattr(settings, "SUPPLIER_RESPONSE_CACHE_TIMEOUT", 5 * 60))
+        return facets
+
+    @classmethod
+    def build_facets(cls, queryset) -> Dict[str, List[Dict[str, Any]]]:
+        base = queryset.order_by()
+        if connections[base.db].vendor == "postgresql":
+            rows = cls._grouping_sets_rows(base)
+        else:
+            rows = cls._union_rows(base)
+        facets: Dict[str, List[Dict[str, Any]]] = {name: [] for name in cls.FACETS}
+        for row in rows:
+            if row["value"] is None:
+                continue
+            facets[row["facet"]].append(cls._entry(row))
+        for entries in facets.values():
+            entries.sort(key=lambda entry: (-entry["count"], str(entry["value"])))
+        return facets
+
+    @classmethod
+    def _union_rows(cls, base) -> Iterator[Dict[str, Any]]:
+        parts = [
+            base.annotate(
+                facet=Value(name, output_field=CharField()),
+                value=Cast(value, CharField()),
+                label=Cast(label, CharField()),
+            )
+            .values("facet", "value", "label")
+            .annotate(count=Count("pk"))
+            .order_by()
+            for name, (value, label) in cls.FACETS.items()
+        ]
+        return iter(parts[0].union(*parts[1:], all=True))
+
+    @classmethod
+    def _grouping_sets_rows(cls, base) -> Iterator[Dict[str, Any]]:
+        sql, params = cls.grouping_sets_query(base)
+        with connections[base.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            records = cursor.fetchall()
+        for record in records:
+            # GROUPING(...) = 0 у колонок набора, по которому сгруппирована строка
+            for index, name in enumerate(cls.FACETS):
+                value, label, grouping = record[index * 3:index * 3 + 3]
+                if grouping == 0:
+                    yield {"facet": name, "value": value, "label": label, "count": record[-1]}
+                    break
+
+    @classmethod
+    def grouping_sets_query(cls, base) -> Tuple[str, tuple]:
+        columns = {}
+        for name, (value, label) in cls.FACETS.items():
+            columns[f"{name}_value"] = F(value)
+            columns[f"{name}_label"] = F(label)
+        # id в выборке: DISTINCT фильтров не должен склеивать разных поставщиков
+        rows = base.annotate(**columns).values("pk", *columns)
+        inner, params = rows.query.get_compiler(using=base.db).as_sql()
+        select = ", ".join(
+            f'"{name}_value"::text, "{name}_label"::text, GROUPING("{name}_value")' for name in cls.FACETS
+        )
+        sets = ", ".join(f'("{name}_value", "{name}_label")' for name in cls.FACETS)
+        sql = f"SELECT {select}, COUNT(*) FROM ({inner}) AS facet_rows GROUP BY GROUPING SETS ({sets})"
+        return sql, params
+
+    @staticmethod
+    def _entry(row: Dict[str, Any]) -> Dict[str, Any]:
+        facet, value, label = row["facet"], row["value"], row["label"]
+        if facet == "is_premium":
+            value = value.lower() in ("1", "true", "t")
+            label = "Премиум" if value else "Стандарт"
+        elif facet in ("country", "city"):
+            value = int(value)
+        elif facet == "verification_status":
+            label = VerificationStatus(value).label
+        return {"value": value, "label": label, "count": row["count"]}
@@ -0,0 +1,161 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import invalidate_suppliers
+from .models import Category, City, Country, LogisticsCompany, Supplier, VerificationCheck
+from .reference import reference_data
+from .search import SupplierSearchIndex
+
+SEARCH_SOURCE_FIELDS = {"name", "description", "country", "city", "category"}
+# Поля, от которых зависит supplier_count категории в карточках поставщиков
+MEMBERSHIP_FIELDS = {"category", "is_active"}
+
+
+def touch_suppliers(supplier_ids):
+    """Сдвигает updated_at и сбрасывает кэш: ответ API поставщика изменился, хотя его строка — нет"""
+    if supplier_ids:
+        Supplier.objects.filter(pk__in=supplier_ids).update(updated_at=timezone.now())
+        invalidate_responses(supplier_ids)
+
+
+def invalidate_responses(supplier_ids, category_ids=()):
+    supplier_ids = list(supplier_ids)
+    category_ids = [pk for pk in set(category_ids) if pk is not None]
+    transaction.on_commit(lambda: invalidate_suppliers(supplier_ids, category_ids))
+
+
+@receiver(pre_save, sender=Supplier)
+def remember_supplier_membership(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._saved_membership = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not MEMBERSHIP_FIELDS.intersection(update_fields):
+        return
+    instance._saved_membership = (
+        Supplier.objects.filter(pk=instance.pk).values_list("category_id", "is_active").first()
+    )
+
+
+@receiver(post_save, sender=Supplier)
+def invalidate_supplier_responses(sender, instance, created=False, **kwargs):
+    category_ids = []
+    saved = getattr(instance, "_saved_membership", None)
+    if created:
+        category_ids = [instance.category_id]
+    elif saved is not None and saved != (instance.category_id, instance.is_active):
+        # Поставщик пришёл в категорию, ушёл из неё или сменил активность
+        category_ids = [saved[0], instance.category_id]
+    invalidate_responses([instance.pk], category_ids)
+
+
+@receiver(post_delete, sender=Supplier)
+def invalidate_deleted_supplier_responses(sender, instance, **kwargs):
+    invalidate_responses([instance.pk], [instance.category_id])
+
+
+@receiver(post_save, sender=VerificationCheck)
+@receiver(post_delete, sender=VerificationCheck)
+def invalidate_check_responses(sender, instance, **kwargs):
+    invalidate_responses([instance.supplier_id])
+
+
+@receiver(pre_delete, sender=LogisticsCompany)
+def invalidate_logistics_responses(sender, instance, **kwargs):
+    # Связи m2m удаляются каскадом без m2m_changed
+    invalidate_responses(instance.supplier_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Supplier)
+def reindex_supplier(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_SOURCE_FIELDS.intersection(update_fields):
+        return
+    SupplierSearchIndex.update([instance.pk])
+
+
+@receiver(post_delete, sender=Supplier)
+def unindex_supplier(sender, instance, **kwargs):
+    SupplierSearchIndex.remove([instance.pk])
+
+
+@receiver(m2m_changed, sender=Supplier.additional_categories.through)
+@receiver(m2m_changed, sender=Supplier.logistics_options.through)
+def reindex_supplier_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    supplier_ids = [instance.pk] if not reverse else list(pk_set or ())
+    SupplierSearchIndex.update(supplier_ids)
+    touch_suppliers(supplier_ids)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_suppliers(sender, instance, raw=False, **kwargs):
+    if raw:
+        # loaddata обходит Category.save — достраиваем путь здесь
+        instance.update_tree_fields()
+        return
+    # Путь категории входит в документ всех поставщиков её поддерева
+    category_ids = instance.get_descendants().values("pk")
+    supplier_ids = set(
+        Supplier.objects.filter(category_id__in=category_ids).values_list("pk", flat=True)
+    )
+    supplier_ids.update(
+        Supplier.additional_categories.through.objects.filter(
+            category_id__in=category_ids
+        ).values_list("supplier_id", flat=True)
+    )
+    SupplierSearchIndex.update(supplier_ids)
+    touch_suppliers(supplier_ids)
+
+
+@receiver(post_save, sender=LogisticsCompany)
+def reindex_logistics_suppliers(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    supplier_ids = list(instance.supplier_set.values_list("pk", flat=True))
+    SupplierSearchIndex.update(supplier_ids)
+    touch_suppliers(supplier_ids)
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=City)
+def reindex_location_suppliers(sender, instance, created=False, raw=False, **kwargs):
+    # Название страны/города входит в поисковый документ и ответ API
+    if raw or created:
+        return
+    supplier_ids = list(instance.suppliers.values_list("pk", flat=True))
+    SupplierSearchIndex.update(supplier_ids)
+    touch_suppliers(supplier_ids)
+
+
+@receiver(post_delete, sender=VerificationCheck)
+def repoint_latest_check(sender, instance, **kwargs):
+    # on_delete=SET_NULL уже обнулил указатель — возвращаем его на предыдущую проверку
+    previous = (
+        VerificationCheck.objects.filter(supplier_id=OuterRef("pk"))
+        .order_by("-id")
+        .values("pk")[:1]
+    )
+    Supplier.objects.filter(pk=instance.supplier_id, latest_check__isnull=True).update(
+        latest_check=Subquery(previous), updated_at=timezone.now()
+    )
+
+
+REFERENCE_TABLES = {Category: "categories", LogisticsCompany: "logistics", Country: "countries"}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=LogisticsCompany)
+@receiver(post_delete, sender=LogisticsCompany)
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def invalidate_reference_data(sender, **kwargs):
+    # Свой процесс сбрасывает копию сразу, остальные — по сообщению после коммита
+    table = REFERENCE_TABLES[sender]
+    reference_data.invalidate_local(table)
+    transaction.on_commit(lambda: reference_data.publish(table))
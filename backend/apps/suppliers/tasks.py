@@ -1,71 +1,296 @@
 from __future__ import annotations
 
 import logging
-from typing import Iterable
+import math
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+from typing import Iterable, Iterator, List, Tuple
 
-from celery import shared_task
-from django.db import transaction
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.db import models
 from django.utils import timezone
 
+from .caching import ResponseCache, response_tags
+from .locks import VerificationEnqueueGuard, VerificationLock
 from .models import Supplier, VerificationCheck, VerificationStatus
-from .services import VerificationService
+from .progress import (
+    BatchProgress,
+    is_fallback,
+    publish_check_finished,
+    publish_source_result,
+    publish_verification_event,
+)
+from .services import VerificationResultBuffer, VerificationService
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
 def verify_supplier_task(self, supplier_id: int) -> int:
-    supplier = Supplier.objects.select_for_update().get(pk=supplier_id)
-    service = VerificationService(supplier)
-
-    with transaction.atomic():
-        supplier.verification_status = VerificationStatus.IN_PROGRESS
-        supplier.save(update_fields=["verification_status"])
-        check = VerificationCheck.objects.create(
-            supplier=supplier,
-            country=supplier.country,
-            status=VerificationStatus.IN_PROGRESS,
-        )
+    return run_verification(supplier_id, self.request.id)
+
+
+@shared_task(ignore_result=True)
+def expire_supplier_responses(supplier_ids: List[int], category_ids: List[int] | None = None) -> None:
+    """Repeats a cache invalidation once replicas have caught up (see ``invalidate_suppliers``)."""
+    ResponseCache.invalidate(response_tags(supplier_ids, category_ids or ()))
 
+
+@shared_task(bind=True)
+def verify_suppliers_chunk(self, supplier_ids: List[int], batch_id: str | None = None) -> int:
+    """Verifies a chunk of suppliers: one broker message and a few bulk writes per chunk."""
     try:
-        payload = service.check_all()
-        scores = payload["scores"]
-        check.checked_sources = payload["sources"]
-        check.fssp_score = scores["fssp_score"]
-        check.rnp_score = scores["rnp_score"]
-        check.egrul_score = scores["egrul_score"]
-        check.licenses_score = scores["licenses_score"]
-        check.status = VerificationStatus.COMPLETED
-        check.completed_at = timezone.now()
-        check.save()
-
-        supplier.refresh_from_db()
-        supplier.apply_verification_result(check)
-        logger.info("Supplier %s verified via task %s", supplier_id, self.request.id)
-        return check.id
-    except Exception as exc:
-        logger.error("Verification failed for supplier %s: %s", supplier_id, exc)
-        check.status = VerificationStatus.FAILED
-        check.error_message = str(exc)
-        check.completed_at = timezone.now()
-        check.save(update_fields=["status", "error_message", "completed_at", "updated_at"])
-
-        supplier.verification_status = VerificationStatus.FAILED
-        supplier.is_verified = False
-        supplier.save(update_fields=["verification_status", "is_verified"])
-        raise
+        checks = verify_suppliers(supplier_ids, batch_id)
+    except Exception:
+        # Упавший чанк не должен останавливать пакет: продолжение ждёт все чанки порции
+        logger.exception("Batch %s: chunk %s failed", batch_id, supplier_ids)
+        return 0
+    verified = sum(check.status == VerificationStatus.COMPLETED for check in checks)
+    logger.info(
+        "Batch %s: verified %s of %s suppliers via task %s",
+        batch_id, verified, len(supplier_ids), self.request.id,
+    )
+    return verified
+
+
+def enqueue_verification(supplier_id: int) -> Tuple[str, bool]:
+    """Ставит проверку поставщика; повтор в пределах окна возвращает ID уже поставленной задачи"""
+    task_id = uuid.uuid4().hex
+    existing = VerificationEnqueueGuard(supplier_id).claim(task_id)
+    if existing:
+        return existing, False
+    verify_supplier_task.apply_async((supplier_id,), task_id=task_id)
+    return task_id, True
+
+
+def run_verification(supplier_id: int, task_id: str | None = None) -> int | None:
+    if not Supplier.objects.filter(pk=supplier_id).exists():
+        raise Supplier.DoesNotExist(f"Supplier {supplier_id} does not exist")
+    checks = verify_suppliers([supplier_id])
+    if not checks:
+        logger.info("Supplier %s is already being verified, task %s skipped", supplier_id, task_id)
+        return None
+    check = checks[0]
+    if check.status == VerificationStatus.FAILED:
+        raise RuntimeError(check.error_message)
+    logger.info("Supplier %s verified via task %s", supplier_id, task_id)
+    return check.id
+
+
+def verify_suppliers(supplier_ids: List[int], batch_id: str | None = None) -> List[VerificationCheck]:
+    """
+    Verifies suppliers and writes the outcomes through ``VerificationResultBuffer``.
+
+    Outcomes are flushed every ``VERIFICATION_FLUSH_EVERY`` suppliers or
+    ``VERIFICATION_FLUSH_INTERVAL`` seconds, whichever comes first, and the
+    "completed" events and batch progress go out per flushed slice.
+    A failure of one supplier is recorded on its check and does not abort
+    the others. Suppliers whose ``VerificationLock`` is held by another run
+    are skipped; locks are held until the outcomes are written. With a
+    ``batch_id`` the outcome is added to the batch's ``BatchProgress``.
+    """
+    progress = BatchProgress(batch_id) if batch_id else None
+    flush_every = getattr(settings, "VERIFICATION_FLUSH_EVERY", 10)
+    flush_interval = getattr(settings, "VERIFICATION_FLUSH_INTERVAL", 60)
+    timeout = getattr(settings, "VERIFICATION_LOCK_TIMEOUT", 2 * 60) * max(len(supplier_ids), 1)
+    locks = []
+    for supplier_id in supplier_ids:
+        lock = VerificationLock(supplier_id, timeout)
+        if lock.acquire():
+            locks.append(lock)
+        else:
+            logger.info("Supplier %s is locked by another verification", supplier_id)
+    try:
+        locked_ids = [lock.supplier_id for lock in locks]
+        suppliers = list(Supplier.objects.filter(pk__in=locked_ids).order_by("pk"))
+        buffer = VerificationResultBuffer()
+        checks = buffer.start(suppliers)
+        if progress:
+            progress.increment(running=len(checks), skipped=len(supplier_ids) - len(checks))
+        fallbacks: Counter = Counter()
+
+        def flush() -> None:
+            flushed = buffer.flush()
+            if not flushed:
+                return
+            if progress:
+                failed = sum(check.status == VerificationStatus.FAILED for check in flushed)
+                progress.increment(running=-len(flushed), succeeded=len(flushed) - failed, failed=failed)
+                progress.record_fallbacks(fallbacks)
+            fallbacks.clear()
+            for check in flushed:
+                publish_check_finished(check)
+
+        flushed_at = time.monotonic()
+        for check in checks:
+            publish_verification_event(check.supplier_id, "started", check_id=check.id)
+            try:
+                payload = VerificationService(check.supplier).check_all(
+                    on_result=partial(publish_source_result, check.supplier_id, check.id)
+                )
+                buffer.complete(check, payload)
+                fallbacks.update(
+                    source for source, result in payload["sources"].items() if is_fallback(result)
+                )
+            except Exception as exc:
+                logger.error("Verification failed for supplier %s: %s", check.supplier_id, exc)
+                buffer.fail(check, exc)
+            if len(buffer.pending) >= flush_every or time.monotonic() - flushed_at >= flush_interval:
+                flush()
+                flushed_at = time.monotonic()
+        flush()
+    finally:
+        for lock in locks:
+            lock.release()
+    return checks
 
 
 @shared_task
-def batch_verify_suppliers(supplier_ids: Iterable[int] | None = None) -> int:
-    ids = (
-        list(supplier_ids)
-        if supplier_ids
-        else list(
-            Supplier.objects.filter(is_active=True).values_list("id", flat=True)
+def batch_verify_suppliers(
+    supplier_ids: Iterable[int] | None = None,
+    batch_id: str | None = None,
+    after_id: int = 0,
+) -> str:
+    """
+    Streams supplier IDs in keyset chunks and dispatches them as groups of chunk tasks.
+
+    Each run dispatches at most ``VERIFICATION_BATCH_DISPATCH_CHUNKS`` chunks
+    as a chord whose callback is the next run, from the last ID: the next
+    round is queued only after the current one has finished, so no more than
+    that many chunks of a batch are on the broker at a time and no task
+    holds the whole ID set. An explicit ``supplier_ids`` list is passed on
+    without the dispatched IDs.
+    """
+    batch_id = batch_id or uuid.uuid4().hex
+    supplier_ids = [int(pk) for pk in supplier_ids] if supplier_ids else None
+    chunk_size = batch_chunk_size()
+    dispatch_limit = getattr(settings, "VERIFICATION_BATCH_DISPATCH_CHUNKS", 10)
+
+    chunks: List[List[int]] = []
+    for ids in iter_id_chunks(batch_queryset(supplier_ids), chunk_size, after_id):
+        chunks.append(ids)
+        if len(chunks) >= dispatch_limit:
+            break
+    progress = BatchProgress(batch_id)
+    if not chunks:
+        progress.mark_dispatch_complete()
+        return batch_id
+
+    progress.increment(queued=sum(len(ids) for ids in chunks))
+    header = group(verify_suppliers_chunk.s(ids, batch_id) for ids in chunks)
+    last_id = chunks[-1][-1]
+    remaining = None
+    if supplier_ids:
+        # Пустой остаток нельзя передавать дальше: None означает «все активные»
+        remaining = [pk for pk in supplier_ids if pk > last_id]
+    if len(chunks) >= dispatch_limit and remaining != []:
+        chord(header)(
+            batch_verify_suppliers.si(supplier_ids=remaining, batch_id=batch_id, after_id=last_id)
+        )
+    else:
+        header.apply_async()
+        progress.mark_dispatch_complete()
+    logger.info("Batch %s: dispatched %s chunks after id %s", batch_id, len(chunks), after_id)
+    return batch_id
+
+
+@shared_task
+def schedule_renewal_verifications() -> int:
+    """
+    Beat job: re-verifies suppliers whose renewal deadline has passed.
+
+    Runs every ``VERIFICATION_RENEWAL_INTERVAL`` seconds and takes the share
+    of the due backlog that clears it within ``VERIFICATION_RENEWAL_WINDOW``
+    (most urgent first), spacing the tasks evenly across the interval.
+    Countdowns never exceed the interval, so no ETA outlives the broker's
+    visibility timeout.
+    """
+    interval = getattr(settings, "VERIFICATION_RENEWAL_INTERVAL", 10 * 60)
+    window = getattr(settings, "VERIFICATION_RENEWAL_WINDOW", 6 * 60 * 60)
+    limit = getattr(settings, "VERIFICATION_RENEWAL_MAX_PER_RUN", 1000)
+
+    due = renewal_queryset()
+    total = due.count()
+    if not total:
+        return 0
+    runs = max(1, window // interval)
+    quota = min(math.ceil(total / runs), limit)
+    supplier_ids = list(
+        due.order_by("verification_expires_at", "pk").values_list("pk", flat=True)[:quota]
+    )
+    step = interval / len(supplier_ids)
+    for position, supplier_id in enumerate(supplier_ids):
+        verify_supplier_task.apply_async((supplier_id,), countdown=round(position * step, 1))
+    logger.info("Scheduled %s of %s due renewals over %ss", len(supplier_ids), total, interval)
+    return len(supplier_ids)
+
+
+def renewal_queryset(now=None) -> models.QuerySet:
+    """
+    Активные поставщики, у которых наступил срок продления проверки.
+
+    Непрошедшая или упавшая перепроверка срок не сдвигает, поэтому
+    поставщики, уже проверенные после начала окна продления, исключаются —
+    иначе они выбирались бы первыми на каждом проходе.
+    """
+    now = now or timezone.now()
+    return (
+        Supplier.objects.filter(
+            is_active=True,
+            verification_expires_at__isnull=False,
+            verification_expires_at__lte=now + Supplier.RENEWAL_LEAD_TIME,
+        )
+        .exclude(in_flight_condition())
+        .exclude(
+            latest_check__completed_at__gte=models.F("verification_expires_at") - Supplier.RENEWAL_LEAD_TIME
         )
     )
-    for supplier_id in ids:
-        verify_supplier_task.delay(supplier_id)
-    return len(ids)
 
+
+def batch_chunk_size() -> int:
+    """
+    ``VERIFICATION_BATCH_CHUNK_SIZE`` capped so that a chunk finishes within
+    ``VERIFICATION_IN_FLIGHT_TIMEOUT``.
+
+    All checks of a chunk are marked in progress when it starts; the last
+    supplier of a larger chunk would still be waiting after the timeout and
+    could be queued again by another run.
+    """
+    chunk_size = getattr(settings, "VERIFICATION_BATCH_CHUNK_SIZE", 20)
+    timeout = getattr(settings, "VERIFICATION_IN_FLIGHT_TIMEOUT", 15 * 60)
+    deadline = getattr(settings, "VERIFICATION_DEADLINE_SECONDS", 40)
+    return max(1, min(chunk_size, int(timeout // max(deadline, 1))))
+
+
+def batch_queryset(supplier_ids: List[int] | None = None) -> models.QuerySet:
+    queryset = (
+        Supplier.objects.filter(pk__in=supplier_ids)
+        if supplier_ids
+        else Supplier.objects.filter(is_active=True)
+    )
+    return queryset.exclude(in_flight_condition())
+
+
+def in_flight_condition() -> models.Q:
+    """Поставщики, проверка которых уже идёт (и ещё не считается зависшей)."""
+    timeout = getattr(settings, "VERIFICATION_IN_FLIGHT_TIMEOUT", 15 * 60)
+    return models.Q(
+        verification_status=VerificationStatus.IN_PROGRESS,
+        latest_check__started_at__gte=timezone.now() - timedelta(seconds=timeout),
+    )
+
+
+def iter_id_chunks(queryset: models.QuerySet, chunk_size: int, after_id: int = 0) -> Iterator[List[int]]:
+    """Keyset iteration over primary keys: every chunk is one indexed range query."""
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=after_id).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        after_id = ids[-1]
@@ -0,0 +1,1034 @@
+import base64
+import importlib
+import json
+import time
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
+
+import redis
+import requests
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.suppliers.locks import VerificationLock
+from apps.suppliers.models import (
+    Category,
+    City,
+    Country,
+    LogisticsCompany,
+    Supplier,
+    VerificationCheck,
+    VerificationPayload,
+    VerificationStatus,
+)
+from apps.suppliers.pagination import KeysetCursorPagination
+from apps.suppliers.progress import verification_group
+from apps.suppliers.registries import (
+    CircuitBreaker,
+    RegistryResponseCache,
+    RegistryUnavailable,
+    get_registry_client,
+)
+from apps.suppliers.reference import reference_data
+from apps.suppliers.search import SupplierSearchIndex
+from apps.suppliers.serializers import SupplierSerializer
+from apps.suppliers.services import SupplierFacetService, VerificationService
+from apps.suppliers.tasks import (
+    batch_chunk_size,
+    batch_verify_suppliers,
+    schedule_renewal_verifications,
+    verify_suppliers,
+)
+from apps.utils import db_routing
+from apps.utils.db_routing import PIN_COOKIE, PrimaryReplicaRouter, replica_reads
+from config.database import database_config, parse_database_url
+
+User = get_user_model()
+
+
+class FakeRedis:
+    """Минимальная замена Redis для кэша реестров и блокировок"""
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.published = []
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def exists(self, key):
+        return int(key in self.values)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    def expire(self, key, seconds):
+        return key in self.values
+
+    def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def hincrby(self, key, field, amount=1):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = int(fields.get(field, 0)) + amount
+        return fields[field]
+
+    def hgetall(self, key):
+        return {field: str(value) for field, value in self.hashes.get(key, {}).items()}
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+    def eval(self, script, numkeys, key, token):
+        # Поддерживается только снятие блокировки владельцем
+        assert script == VerificationLock.RELEASE_SCRIPT
+        if self.values.get(key) == token:
+            return self.delete(key)
+        return 0
+
+
+class SupplierAPITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_data.invalidate_local()
+        # Подписка на инвалидации справочников — в ReferenceDataCacheTestCase
+        listener = mock.patch.object(reference_data, '_ensure_listener')
+        listener.start()
+        self.addCleanup(listener.stop)
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.electronics = Category.objects.create(name='Электроника', slug='electronics')
+        self.phones = Category.objects.create(name='Смартфоны', slug='phones', parent=self.electronics)
+
+    COUNTRY_CODES = {'Китай': 'CN', 'Россия': 'RU', 'Турция': 'TR'}
+
+    def create_supplier(self, **kwargs):
+        data = {'name': 'Поставщик', 'country': 'Китай', 'city': 'Шэньчжэнь'}
+        data.update(kwargs)
+        data['country'], _ = Country.objects.get_or_create(
+            name=data['country'], defaults={'code': self.COUNTRY_CODES.get(data['country'])}
+        )
+        data['city'], _ = City.objects.get_or_create(country=data['country'], name=data['city'])
+        return Supplier.objects.create(**data)
+
+
+class SupplierSearchTestCase(SupplierAPITestCase):
+    def search(self, query):
+        response = self.client.get('/api/v1/suppliers/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['results']]
+
+    def test_search_covers_category_path_and_logistics(self):
+        supplier = self.create_supplier(name='Shenzhen Tech', category=self.phones)
+        company = LogisticsCompany.objects.create(name='Деловые Линии')
+        supplier.logistics_options.add(company)
+        self.create_supplier(name='Other')
+
+        self.assertEqual(self.search('электроника'), [supplier.id])
+        self.assertEqual(self.search('деловые'), [supplier.id])
+
+    def test_category_rename_reindexes_suppliers(self):
+        supplier = self.create_supplier(category=self.phones)
+        self.electronics.name = 'Гаджеты'
+        self.electronics.save()
+
+        self.assertEqual(self.search('гаджеты'), [supplier.id])
+        self.assertEqual(self.search('электроника'), [])
+
+    def test_migration_reindexes_documents_built_from_raw_locations(self):
+        supplier = self.create_supplier(description='Пластик')
+        stale = Supplier.objects.filter(pk=supplier.pk)
+        stale.update(search_document='Пластик КНР Шэньчжэнь')
+        SupplierSearchIndex._sync_fts(list(stale))
+        self.assertEqual(self.search('кнр'), [supplier.id])
+
+        migration = importlib.import_module('apps.suppliers.migrations.0011_rebuild_search_document')
+        migration.rebuild_search_document(django_apps, None)
+        cache.clear()
+        self.assertEqual(self.search('китай'), [supplier.id])
+        self.assertEqual(self.search('кнр'), [])
+
+    def test_name_match_ranks_first(self):
+        by_description = self.create_supplier(name='Alpha', description='Производим мебель')
+        by_name = self.create_supplier(name='Мебель Плюс')
+
+        self.assertEqual(self.search('мебель'), [by_name.id, by_description.id])
+
+
+class KeysetPaginationTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        scores = [None, Decimal('0.90'), Decimal('0.90'), None, Decimal('0.50'), Decimal('0.75'), None]
+        for index, score in enumerate(scores):
+            self.create_supplier(name=f'Supplier {index % 3}', verification_score=score, is_premium=index == 4)
+
+    def walk(self, params):
+        ids = []
+        response = self.client.get('/api/v1/suppliers/', {'cursor': '', 'page_size': 2, **params})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_pages_match_page_number_order(self):
+        for ordering in ('-created_at', 'name', '-name', 'moq'):
+            full = self.client.get('/api/v1/suppliers/', {'ordering': ordering, 'page_size': 100})
+            expected = [row['id'] for row in full.data['results']]
+            ids, _ = self.walk({'ordering': ordering})
+            self.assertEqual(ids, expected, ordering)
+
+    def test_previous_link_returns_preceding_page(self):
+        ids, last_page = self.walk({'ordering': 'name'})
+        previous = self.client.get(last_page.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], ids[-3:-1])
+
+    def test_tampered_cursor_is_not_found(self):
+        for position in (['garbage', 1], ['2024-01-01T00:00:00+00:00', 'x'], [[1], 1]):
+            cursor = base64.b64encode(urlencode({'p': json.dumps(position)}).encode()).decode()
+            response = self.client.get('/api/v1/suppliers/', {'cursor': cursor, 'ordering': '-created_at'})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_model_ordering_with_null_scores(self):
+        paginator = KeysetCursorPagination()
+        paginator.page_size = 3
+        expected = list(Supplier.objects.values_list('id', flat=True))
+        ids, url = [], '/api/v1/suppliers/?cursor='
+        while url:
+            request = Request(APIRequestFactory().get(url))
+            ids.extend(supplier.id for supplier in paginator.paginate_queryset(Supplier.objects.all(), request))
+            url = paginator.get_next_link()
+        self.assertEqual(ids, expected)
+        self.assertEqual(Supplier.objects.get(pk=ids[0]).is_premium, True)
+        self.assertIsNone(Supplier.objects.get(pk=ids[-1]).verification_score)
+
+
+class LatestCheckTestCase(SupplierAPITestCase):
+    def create_checks(self, supplier, count):
+        return [VerificationCheck.objects.create(supplier=supplier, country=supplier.country) for _ in range(count)]
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/suppliers/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_latest_check_pointer_follows_new_and_deleted_checks(self):
+        supplier = self.create_supplier()
+        first, second = self.create_checks(supplier, 2)
+        supplier.refresh_from_db()
+        self.assertEqual(supplier.latest_check_id, second.id)
+
+        second.delete()
+        supplier.refresh_from_db()
+        self.assertEqual(supplier.latest_check_id, first.id)
+
+    def test_list_query_count_does_not_depend_on_rows_or_history(self):
+        self.create_checks(self.create_supplier(), 3)
+        baseline, _ = self.count_list_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.create_checks(self.create_supplier(), 4)
+        queries, response = self.count_list_queries()
+
+        self.assertEqual(queries, baseline)
+        latest = response.data['results'][0]['latest_check']
+        self.assertEqual(latest['id'], VerificationCheck.objects.order_by('-id').first().id)
+
+
+class CategoryTreeTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.android = Category.objects.create(name='Android', slug='android', parent=self.phones)
+        self.furniture = Category.objects.create(name='Мебель', slug='furniture')
+
+    def test_full_path_is_materialized(self):
+        android = Category.objects.get(pk=self.android.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(android.get_full_path(), 'Электроника → Смартфоны → Android')
+        self.assertEqual(android.path, f'{self.electronics.pk}/{self.phones.pk}/{self.android.pk}/')
+        self.assertEqual(android.depth, 2)
+
+    def test_move_updates_whole_subtree(self):
+        self.phones.parent = self.furniture
+        self.phones.save()
+
+        android = Category.objects.get(pk=self.android.pk)
+        self.assertEqual(android.get_full_path(), 'Мебель → Смартфоны → Android')
+        self.assertTrue(android.path.startswith(f'{self.furniture.pk}/'))
+
+        self.furniture.parent = self.android
+        with self.assertRaises(ValidationError):
+            self.furniture.save()
+
+    def test_category_tree_filter_matches_subtree_and_additional_categories(self):
+        primary = self.create_supplier(name='Primary', category=self.android)
+        additional = self.create_supplier(name='Additional', category=self.furniture)
+        additional.additional_categories.add(self.phones)
+        self.create_supplier(name='Outside', category=self.furniture)
+
+        response = self.client.get('/api/v1/suppliers/', {'category_tree': 'electronics'})
+        ids = {row['id'] for row in response.data['results']}
+        self.assertEqual(ids, {primary.id, additional.id})
+
+
+class CategoryTreeEndpointTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(None)
+
+    def test_tree_is_nested_and_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/suppliers/categories/tree/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['slug'], 'electronics')
+        self.assertEqual(response.data[0]['children'][0]['full_path'], 'Электроника → Смартфоны')
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/suppliers/categories/tree/')
+
+    def test_tree_is_invalidated_on_category_change(self):
+        self.client.get('/api/v1/suppliers/categories/tree/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Планшеты', slug='tablets', parent=self.electronics)
+
+        response = self.client.get('/api/v1/suppliers/categories/tree/')
+        children = [child['slug'] for child in response.data[0]['children']]
+        self.assertEqual(children, ['tablets', 'phones'])
+
+
+class VerificationServiceTestCase(SupplierAPITestCase):
+    def slow_source(self, delay):
+        def fetch():
+            time.sleep(delay)
+            return {'source': 'slow', 'status': 'ok', 'score': 0.9, 'payload': {}}
+        return fetch
+
+    @override_settings(VERIFICATION_DEADLINE_SECONDS=0.5)
+    def test_sources_run_concurrently_and_late_ones_are_skipped(self):
+        service = VerificationService(self.create_supplier())
+        with mock.patch.object(service, 'check_fssp', self.slow_source(0.3)), \
+                mock.patch.object(service, 'check_rnp', self.slow_source(0.3)), \
+                mock.patch.object(service, 'check_egrul', self.slow_source(0.3)), \
+                mock.patch.object(service, 'check_licenses', self.slow_source(2)):
+            started = time.monotonic()
+            result = service.check_all()
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 1)
+        self.assertEqual(result['sources']['licenses']['status'], 'timeout')
+        self.assertIsNone(result['scores']['licenses_score'])
+        self.assertEqual(result['scores']['fssp_score'], 0.9)
+
+    @override_settings(FSSP_API_KEY='k', NEWDB_API_KEY='k', FNS_API_KEY='k')
+    def test_requests_share_pooled_session_with_per_source_timeouts(self):
+        client = get_registry_client()
+        self.assertIs(get_registry_client(), client)
+        service = VerificationService(self.create_supplier())
+        response = mock.Mock(**{'json.return_value': {'result': []}})
+        with mock.patch.object(client.session, 'get', return_value=response) as session_get:
+            result = service.check_egrul()
+
+        self.assertEqual(result['score'], 1.0)
+        self.assertEqual(session_get.call_args.kwargs['timeout'], client.timeout_for('egrul'))
+
+
+@override_settings(FSSP_API_KEY='k', NEWDB_API_KEY='k', FNS_API_KEY='k')
+class RegistryRedisTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch('apps.suppliers.registries.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class RegistryResponseCacheTestCase(RegistryRedisTestCase):
+    def test_same_inn_is_fetched_once(self):
+        first = VerificationService(self.create_supplier(name='A', contact_phone='+7 495 111-22-33'))
+        second = VerificationService(self.create_supplier(name='B', contact_phone='7 (495) 111 22 33'))
+        with mock.patch.object(VerificationService, '_request', return_value={'result': [1]}) as request:
+            first.check_egrul()
+            result = second.check_egrul()
+
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(result['score'], 0.85)
+        self.assertEqual(RegistryResponseCache().stats()['egrul'], {'hits': 1, 'misses': 1})
+
+    def test_errors_are_cached(self):
+        service = VerificationService(self.create_supplier())
+        with mock.patch.object(VerificationService, '_request', side_effect=RuntimeError('503')) as request:
+            service.check_egrul()
+            result = service.check_egrul()
+
+        self.assertEqual(request.call_count, 1)
+        self.assertTrue(result['payload']['mock'])
+
+
+@override_settings(REGISTRY_BREAKER_FAILURE_THRESHOLD=2, REGISTRY_RATE_LIMITS={})
+class CircuitBreakerTestCase(RegistryRedisTestCase):
+    def test_breaker_fails_fast_and_probes_for_recovery(self):
+        service = VerificationService(self.create_supplier())
+        client = get_registry_client()
+        params = {'req': '1'}
+        with mock.patch.object(client, 'get', side_effect=requests.ConnectionError('down')) as get:
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    service._request('egrul', 'https://example.com', params)
+            with self.assertRaises(RegistryUnavailable):
+                service._request('egrul', 'https://example.com', params)
+        self.assertEqual(get.call_count, 2)
+
+        # Истёк cooldown: проходит один пробный запрос, успех закрывает breaker
+        breaker = CircuitBreaker('egrul')
+        self.redis.delete(breaker.open_key)
+        with mock.patch.object(client, 'get', return_value={'result': []}):
+            service._request('egrul', 'https://example.com', params)
+        self.assertFalse(self.redis.exists(breaker.tripped_key))
+        self.assertTrue(breaker.allow_request())
+
+
+@override_settings(VERIFICATION_BATCH_CHUNK_SIZE=2, VERIFICATION_BATCH_DISPATCH_CHUNKS=2)
+class BatchVerificationTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch('apps.suppliers.progress.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_dispatches_chunks_and_continues_after_last_id(self):
+        suppliers = [self.create_supplier(name=f'S{i}') for i in range(5)]
+        busy = suppliers[1]
+        VerificationCheck.objects.create(supplier=busy, country=busy.country)
+        Supplier.objects.filter(pk=busy.pk).update(verification_status=VerificationStatus.IN_PROGRESS)
+
+        with mock.patch('apps.suppliers.tasks.group') as group, \
+                mock.patch('apps.suppliers.tasks.chord') as chord:
+            batch_verify_suppliers(batch_id='b1')
+
+        signatures = list(group.call_args.args[0])
+        chunks = [signature.args[0] for signature in signatures]
+        ids = [s.pk for s in suppliers if s.pk != busy.pk]
+        self.assertEqual(chunks, [ids[:2], ids[2:4]])
+        self.assertEqual(signatures[0].args[1], 'b1')
+        # Следующая порция — колбэк аккорда: ставится, когда текущие чанки закончатся
+        chord.assert_called_once_with(group.return_value)
+        group.return_value.apply_async.assert_not_called()
+        self.assertEqual(self.continuation(chord).kwargs['after_id'], ids[3])
+
+    @staticmethod
+    def continuation(chord):
+        return chord.return_value.call_args.args[0]
+
+    def test_continuation_carries_only_remaining_ids(self):
+        ids = [self.create_supplier(name=f'S{i}').pk for i in range(6)]
+        with mock.patch('apps.suppliers.tasks.group'), mock.patch('apps.suppliers.tasks.chord') as chord:
+            batch_verify_suppliers(supplier_ids=[str(pk) for pk in ids], batch_id='b1')
+        self.assertEqual(self.continuation(chord).kwargs['supplier_ids'], ids[4:])
+
+        with mock.patch('apps.suppliers.tasks.group') as group, mock.patch('apps.suppliers.tasks.chord') as chord:
+            batch_verify_suppliers(supplier_ids=ids[:4], batch_id='b2')
+        chord.assert_not_called()
+        group.return_value.apply_async.assert_called_once_with()
+
+    def test_batch_status_counts_outcomes(self):
+        suppliers = [self.create_supplier(name=f'S{i}') for i in range(3)]
+        batch_id = 'a' * 32
+        with mock.patch('apps.suppliers.tasks.group'), mock.patch('apps.suppliers.tasks.chord') as chord:
+            batch_verify_suppliers(batch_id=batch_id)
+            batch_verify_suppliers(**self.continuation(chord).kwargs)
+        results = [RuntimeError('boom'), BulkVerificationWriteTestCase.PAYLOAD, BulkVerificationWriteTestCase.PAYLOAD]
+        with mock.patch.object(VerificationService, 'check_all', side_effect=results):
+            verify_suppliers([supplier.pk for supplier in suppliers], batch_id)
+
+        response = self.client.get(f'/api/v1/suppliers/batches/{batch_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['queued'], 3)
+        self.assertEqual(response.data['running'], 0)
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (2, 1))
+        self.assertTrue(response.data['finished'])
+        self.assertEqual(self.client.get(f'/api/v1/suppliers/batches/{"b" * 32}/').status_code, 404)
+
+    def test_verify_all_returns_batch_id(self):
+        with mock.patch('apps.suppliers.views.batch_verify_suppliers.delay') as delay:
+            response = self.client.post('/api/v1/suppliers/verify_all/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(delay.call_args.kwargs['batch_id'], response.data['batch_id'])
+
+    def test_verify_all_coerces_and_validates_ids(self):
+        with mock.patch('apps.suppliers.views.batch_verify_suppliers.delay') as delay:
+            response = self.client.post('/api/v1/suppliers/verify_all/', {'supplier_ids': ['3', 5]}, format='json')
+            invalid = self.client.post('/api/v1/suppliers/verify_all/', {'supplier_ids': ['x']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(delay.call_args.args[0], [3, 5])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(delay.call_count, 1)
+
+
+@override_settings(VERIFICATION_RENEWAL_INTERVAL=600, VERIFICATION_RENEWAL_WINDOW=1200)
+class RenewalSchedulerTestCase(SupplierAPITestCase):
+    def test_due_suppliers_are_spread_over_interval(self):
+        now = timezone.now()
+        due = [
+            self.create_supplier(name=f'D{i}', verification_expires_at=now + timezone.timedelta(days=i))
+            for i in range(4)
+        ]
+        self.create_supplier(name='Fresh', verification_expires_at=now + timezone.timedelta(days=60))
+        self.create_supplier(name='Never')
+
+        with mock.patch('apps.suppliers.tasks.verify_supplier_task.apply_async') as apply_async:
+            scheduled = schedule_renewal_verifications()
+
+        # Окно из двух интервалов: за проход берётся половина, самые срочные
+        self.assertEqual(scheduled, 2)
+        calls = apply_async.call_args_list
+        self.assertEqual([c.args[0][0] for c in calls], [due[0].pk, due[1].pk])
+        self.assertEqual([c.kwargs['countdown'] for c in calls], [0, 300])
+
+    def test_rechecked_suppliers_are_not_picked_again(self):
+        now = timezone.now()
+        unverified = self.create_supplier(name='Unverified', verification_expires_at=now)
+        failed = self.create_supplier(name='Failed', verification_expires_at=now)
+        payload = {
+            'sources': {'egrul': {'status': 'ok'}},
+            'scores': {'fssp_score': 0.1, 'rnp_score': 0.1, 'egrul_score': 0.1, 'licenses_score': None},
+        }
+        with mock.patch.object(VerificationService, 'check_all', side_effect=[payload, RuntimeError('down')]):
+            verify_suppliers([unverified.pk, failed.pk])
+
+        self.assertEqual(
+            set(Supplier.objects.values_list('pk', 'verification_status')),
+            {(unverified.pk, VerificationStatus.COMPLETED), (failed.pk, VerificationStatus.FAILED)},
+        )
+        with mock.patch('apps.suppliers.tasks.verify_supplier_task.apply_async') as apply_async:
+            self.assertEqual(schedule_renewal_verifications(), 0)
+        apply_async.assert_not_called()
+
+
+class BulkVerificationWriteTestCase(SupplierAPITestCase):
+    PAYLOAD = {
+        'sources': {'egrul': {'status': 'ok'}},
+        'scores': {'fssp_score': 0.9, 'rnp_score': 0.8, 'egrul_score': 1.0, 'licenses_score': None},
+    }
+
+    def verify(self, count):
+        suppliers = [self.create_supplier(name=f'V{i}') for i in range(count)]
+        reference_data.get('countries')  # справочник стран процесса уже загружен
+        with mock.patch.object(VerificationService, 'check_all', return_value=self.PAYLOAD), \
+                CaptureQueriesContext(connection) as queries:
+            verify_suppliers([supplier.pk for supplier in suppliers])
+        return suppliers, len(queries)
+
+    @override_settings(VERIFICATION_FLUSH_EVERY=10)
+    def test_query_count_does_not_depend_on_chunk_size(self):
+        _, small = self.verify(2)
+        suppliers, large = self.verify(10)
+        self.assertEqual(small, large)
+
+        supplier = Supplier.objects.select_related('latest_check').get(pk=suppliers[0].pk)
+        check = supplier.latest_check
+        self.assertEqual(check.status, VerificationStatus.COMPLETED)
+        self.assertEqual(check.overall_score, Decimal('0.90'))
+        self.assertEqual(supplier.verification_score, Decimal('0.90'))
+        self.assertTrue(supplier.is_verified)
+        self.assertEqual(supplier.verification_expires_at, check.completed_at + timezone.timedelta(days=90))
+
+    @override_settings(VERIFICATION_FLUSH_EVERY=2)
+    def test_outcomes_are_flushed_in_slices(self):
+        suppliers = [self.create_supplier(name=f'S{i}') for i in range(3)]
+        seen = []
+
+        def check_all(**kwargs):
+            seen.append(list(Supplier.objects.order_by('pk').values_list('verification_status', flat=True)))
+            return self.PAYLOAD
+
+        with mock.patch.object(VerificationService, 'check_all', side_effect=check_all), \
+                mock.patch('apps.suppliers.tasks.publish_check_finished') as finished:
+            verify_suppliers([supplier.pk for supplier in suppliers])
+
+        # Третий поставщик проверяется, когда первые два уже записаны
+        self.assertEqual(seen[2], [VerificationStatus.COMPLETED] * 2 + [VerificationStatus.IN_PROGRESS])
+        self.assertEqual(finished.call_count, 3)
+
+    @override_settings(
+        VERIFICATION_BATCH_CHUNK_SIZE=100, VERIFICATION_IN_FLIGHT_TIMEOUT=900, VERIFICATION_DEADLINE_SECONDS=40
+    )
+    def test_chunk_fits_in_flight_timeout(self):
+        self.assertEqual(batch_chunk_size(), 22)
+
+    def test_failure_is_recorded_without_aborting_chunk(self):
+        first, second = self.create_supplier(name='A'), self.create_supplier(name='B')
+        with mock.patch.object(VerificationService, 'check_all', side_effect=[RuntimeError('boom'), self.PAYLOAD]):
+            checks = verify_suppliers([first.pk, second.pk])
+        self.assertEqual([c.status for c in checks], [VerificationStatus.FAILED, VerificationStatus.COMPLETED])
+        first.refresh_from_db()
+        self.assertEqual(first.verification_status, VerificationStatus.FAILED)
+        self.assertEqual(first.latest_check.error_message, 'boom')
+
+
+class SupplierSaveValidationTestCase(SupplierAPITestCase):
+    def test_update_fields_validates_only_written_fields(self):
+        supplier = self.create_supplier()
+        Supplier.objects.filter(pk=supplier.pk).update(video_url='https://vimeo.com/1')
+        supplier.refresh_from_db()
+
+        supplier.is_premium = True
+        supplier.save(update_fields=['is_premium'])
+        with self.assertRaises(ValidationError):
+            supplier.save()
+
+        supplier.moq = 0
+        with self.assertRaises(ValidationError):
+            supplier.save(update_fields=['moq'])
+        supplier.save(update_fields=['moq'], trusted=True)
+        self.assertEqual(Supplier.objects.get(pk=supplier.pk).moq, 0)
+
+
+class VerificationDedupeTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch('apps.suppliers.locks.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeat_verify_returns_existing_task(self):
+        supplier = self.create_supplier()
+        url = f'/api/v1/suppliers/{supplier.pk}/verify/'
+        with mock.patch('apps.suppliers.tasks.verify_supplier_task.apply_async') as apply_async:
+            first = self.client.post(url)
+            second = self.client.post(url)
+        self.assertEqual(apply_async.call_count, 1)
+        self.assertEqual(first.data['task_id'], second.data['task_id'])
+        self.assertEqual(apply_async.call_args.kwargs['task_id'], first.data['task_id'])
+
+    def test_locked_supplier_is_skipped(self):
+        busy, free = self.create_supplier(name='Busy'), self.create_supplier(name='Free')
+        VerificationLock(busy.pk, 60).acquire()
+        with mock.patch.object(VerificationService, 'check_all', return_value=BulkVerificationWriteTestCase.PAYLOAD) as check_all:
+            checks = verify_suppliers([busy.pk, free.pk])
+
+        self.assertEqual(check_all.call_count, 1)
+        self.assertEqual([check.supplier_id for check in checks], [free.pk])
+        self.assertFalse(busy.verification_checks.exists())
+        # Свою блокировку задача сняла, чужую — нет
+        self.assertFalse(self.redis.exists(VerificationLock(free.pk, 60).key))
+        self.assertTrue(self.redis.exists(VerificationLock(busy.pk, 60).key))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class VerificationProgressTestCase(SupplierAPITestCase):
+    def test_source_results_and_final_score_are_published(self):
+        supplier = self.create_supplier()
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(verification_group(supplier.pk), channel)
+
+        verify_suppliers([supplier.pk])
+
+        events = []
+        for _ in range(6):
+            events.append(async_to_sync(layer.receive)(channel)['message'])
+        self.assertEqual(events[0]['event'], 'started')
+        self.assertEqual(
+            sorted(event['source'] for event in events[1:5]),
+            sorted(VerificationService.SOURCES),
+        )
+        self.assertEqual(events[5]['event'], VerificationStatus.COMPLETED)
+        self.assertEqual(events[5]['check_id'], supplier.verification_checks.get().pk)
+
+
+class VerificationPayloadStoreTestCase(SupplierAPITestCase):
+    PAYLOAD = {
+        'sources': {
+            'fssp': {'source': 'fssp', 'status': 'ok', 'score': 0.9, 'payload': {'result': [], 'inn': '7707083893'}},
+            'egrul': {'source': 'egrul', 'status': 'timeout', 'score': None, 'payload': {}},
+        },
+        'scores': {'fssp_score': 0.9, 'rnp_score': None, 'egrul_score': None, 'licenses_score': None},
+    }
+
+    def test_payloads_are_deduplicated_and_loaded_on_detail_only(self):
+        first, second = self.create_supplier(name='A'), self.create_supplier(name='B')
+        with mock.patch.object(VerificationService, 'check_all', return_value=self.PAYLOAD):
+            checks = verify_suppliers([first.pk, second.pk])
+
+        self.assertEqual(VerificationPayload.objects.count(), 1)
+        summary = checks[0].checked_sources
+        self.assertNotIn('payload', summary['fssp'])
+        self.assertEqual(summary['fssp']['payload_ref'], VerificationPayload.objects.get().digest)
+        self.assertNotIn('payload_ref', summary['egrul'])
+
+        listing = self.client.get('/api/v1/suppliers/')
+        row = next(row for row in listing.data['results'] if row['id'] == first.pk)
+        self.assertNotIn('payload', row['latest_check']['checked_sources']['fssp'])
+
+        detail = self.client.get(f'/api/v1/suppliers/{first.pk}/verification_checks/{checks[0].pk}/')
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.data['payloads'], {'fssp': {'result': [], 'inn': '7707083893'}})
+
+
+class SparseFieldsetsTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            supplier = self.create_supplier(name=f'S{i}', category=self.phones)
+            VerificationCheck.objects.create(supplier=supplier, country=supplier.country)
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/suppliers/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'], queries
+
+    def test_fields_without_expansion_skip_joins_and_prefetches(self):
+        rows, queries = self.get(fields='id,name,country,latest_check', expand='')
+        self.assertEqual(set(rows[0]), {'id', 'name', 'country', 'latest_check'})
+        self.assertIsInstance(rows[0]['latest_check'], int)
+        self.assertEqual(len(queries), 2)  # COUNT + страница
+        # Единственный JOIN — справочник стран ради названия
+        self.assertEqual(queries[-1]['sql'].count('JOIN'), 1)
+        self.assertIn('JOIN "suppliers_country"', queries[-1]['sql'])
+        self.assertNotIn('description', queries[-1]['sql'])
+
+    def test_expanded_category_counts_suppliers_without_per_row_queries(self):
+        rows, queries = self.get(fields='id,category', expand='category')
+        self.assertEqual(rows[0]['category']['supplier_count'], 3)
+        self.assertEqual(len(queries), 3)  # COUNT + страница + категории
+
+    def test_cursor_pages_work_with_sparse_fields(self):
+        rows, _ = self.get(fields='id,latest_check', cursor='', page_size=2)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['latest_check']['supplier'], rows[0]['id'])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/v1/suppliers/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTestCase(SupplierAPITestCase):
+    def test_unchanged_list_and_detail_return_304_without_serialization(self):
+        supplier = self.create_supplier()
+        for url in ('/api/v1/suppliers/', f'/api/v1/suppliers/{supplier.pk}/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+
+            with mock.patch.object(SupplierSerializer, 'to_representation') as serialize:
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+            serialize.assert_not_called()
+
+        detail = f'/api/v1/suppliers/{supplier.pk}/'
+        last_modified = self.client.get(detail)['Last-Modified']
+        by_date = self.client.get(detail, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(by_date.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_validators_do_not_aggregate_the_catalogue(self):
+        self.create_supplier()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/suppliers/', {'cursor': ''})
+        self.assertTrue(response.has_header('ETag'))
+        self.assertFalse([q['sql'] for q in queries if 'MAX(' in q['sql'] or 'COUNT(' in q['sql']])
+
+    def test_non_numeric_id_is_not_found(self):
+        response = self.client.get('/api/v1/suppliers/abc/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_is_validated_by_etag_only(self):
+        # Удаление не двигает updated_at: по If-Modified-Since список устарел бы незаметно
+        supplier = self.create_supplier()
+        self.assertFalse(self.client.get('/api/v1/suppliers/').has_header('Last-Modified'))
+
+        since = http_date(time.time() + 60)
+        listing = self.client.get('/api/v1/suppliers/', HTTP_IF_MODIFIED_SINCE=since)
+        detail = self.client.get(f'/api/v1/suppliers/{supplier.pk}/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(listing.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_check_and_query_string_change_etag(self):
+        supplier = self.create_supplier()
+        etag = self.client.get('/api/v1/suppliers/')['ETag']
+        self.assertNotEqual(self.client.get('/api/v1/suppliers/', {'page_size': 5})['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VerificationCheck.objects.create(supplier=supplier, country=supplier.country)
+        response = self.client.get('/api/v1/suppliers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheTestCase(SupplierAPITestCase):
+    def test_hit_skips_database_and_saves_invalidate(self):
+        supplier = self.create_supplier(name='Old')
+        url = f'/api/v1/suppliers/{supplier.pk}/'
+        self.client.get('/api/v1/suppliers/', {'ordering': 'name', 'page': 1})
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            listing = self.client.get('/api/v1/suppliers/', {'page': 1, 'ordering': 'name'})
+            detail = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(listing.data['results'][0]['name'], 'Old')
+        self.assertEqual(detail.data['name'], 'Old')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            supplier.name = 'New'
+            supplier.save()
+        self.assertEqual(self.client.get(url).data['name'], 'New')
+        self.assertEqual(self.client.get('/api/v1/suppliers/', {'page': 1, 'ordering': 'name'}).data['results'][0]['name'], 'New')
+
+    def test_category_membership_changes_refresh_cached_details(self):
+        supplier = self.create_supplier(name='A', category=self.phones)
+        url = f'/api/v1/suppliers/{supplier.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(first.data['category']['supplier_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = self.create_supplier(name='B', category=self.phones)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category']['supplier_count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.category = self.electronics
+            other.save()
+        self.assertEqual(self.client.get(url).data['category']['supplier_count'], 1)
+
+        # Правка, не меняющая состав категории, карточки соседей не сбрасывает
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            other.name = 'B2'
+            other.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bulk_verification_invalidates_cached_pages(self):
+        supplier = self.create_supplier()
+        self.client.get('/api/v1/suppliers/')
+        with mock.patch.object(VerificationService, 'check_all', return_value=BulkVerificationWriteTestCase.PAYLOAD):
+            verify_suppliers([supplier.pk])
+        row = self.client.get('/api/v1/suppliers/').data['results'][0]
+        self.assertEqual(row['verification_status'], VerificationStatus.COMPLETED)
+
+
+class FacetsTestCase(SupplierAPITestCase):
+    def test_facets_are_counted_in_one_query_and_cached(self):
+        self.create_supplier(name='Shenzhen Tech', category=self.phones, is_premium=True)
+        self.create_supplier(name='Shenzhen Parts', category=self.phones)
+        self.create_supplier(name='Moscow Trade', country='Россия', city='Москва', category=self.electronics)
+        reference_data.get('countries')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/suppliers/facets/', {'country': 'Китай'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        facets = response.data
+        china = Country.objects.get(code='CN')
+        self.assertEqual(facets['country'], [{'value': china.pk, 'label': 'Китай', 'count': 2}])
+        self.assertEqual(facets['category'], [{'value': 'phones', 'label': 'Смартфоны', 'count': 2}])
+        self.assertEqual(
+            facets['is_premium'],
+            [{'value': False, 'label': 'Стандарт', 'count': 1}, {'value': True, 'label': 'Премиум', 'count': 1}],
+        )
+        self.assertEqual(facets['verification_status'][0]['count'], 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/suppliers/facets/', {'country': 'Китай', 'page': 2})
+        self.assertEqual(len(queries), 0)
+
+    def test_postgres_query_groups_all_facets_in_one_pass(self):
+        sql, params = SupplierFacetService.grouping_sets_query(Supplier.objects.filter(is_active=True).order_by())
+        self.assertEqual(sql.count('GROUP BY'), 1)
+        self.assertIn('GROUPING SETS (("country_value", "country_label"), ("city_value", "city_label")', sql)
+        self.assertEqual(sql.count('GROUPING("'), len(SupplierFacetService.FACETS))
+
+    def test_facets_follow_search(self):
+        self.create_supplier(name='Shenzhen Tech')
+        self.create_supplier(name='Moscow Trade', country='Россия', city='Москва')
+        facets = self.client.get('/api/v1/suppliers/facets/', {'search': 'moscow'}).data
+        self.assertEqual([entry['label'] for entry in facets['city']], ['Москва'])
+
+
+class CountryCityDimensionTestCase(SupplierAPITestCase):
+    def ids(self, **params):
+        response = self.client.get('/api/v1/suppliers/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['id'] for row in response.data['results']}
+
+    def test_filters_accept_iso_code_name_and_key(self):
+        china = self.create_supplier(name='Shenzhen Tech')
+        russia = self.create_supplier(name='Moscow Trade', country='Россия', city='Москва')
+
+        self.assertEqual(self.ids(country='CN'), {china.pk})
+        self.assertEqual(self.ids(country='cn'), {china.pk})
+        self.assertEqual(self.ids(country='Россия'), {russia.pk})
+        self.assertEqual(self.ids(country=russia.country_id), {russia.pk})
+        self.assertEqual(self.ids(city='Москва'), {russia.pk})
+        self.assertEqual(self.ids(country='CN', city=russia.city_id), set())
+
+    def test_supplier_keeps_country_and_city_names_in_api(self):
+        self.create_supplier()
+        row = self.client.get('/api/v1/suppliers/').data['results'][0]
+        self.assertEqual((row['country'], row['country_code'], row['city']), ('Китай', 'CN', 'Шэньчжэнь'))
+
+    def test_license_registry_is_chosen_by_iso_code(self):
+        service = VerificationService(self.create_supplier(country='Турция', city='Стамбул'))
+        with mock.patch.object(service, '_safe_fetch') as fetch:
+            service.check_licenses()
+        self.assertEqual(fetch.call_args.args[1], 'https://api.mersis.gov.tr/v1/companies')
+
+    def test_city_must_belong_to_country(self):
+        supplier = self.create_supplier()
+        supplier.city = City.objects.create(country=Country.objects.get(code='RU'), name='Казань')
+        with self.assertRaises(ValidationError) as error:
+            supplier.full_clean()
+        self.assertIn('city', error.exception.message_dict)
+
+
+class DatabaseUrlTestCase(SimpleTestCase):
+    def test_postgres_url_is_decoded_with_query_options(self):
+        database = parse_database_url('postgresql://lilili_user:p%40ss@db:5432/lilili_prod?sslmode=require')
+        self.assertEqual(
+            (database['ENGINE'], database['NAME'], database['USER'], database['PASSWORD'], database['HOST'], database['PORT']),
+            ('django.db.backends.postgresql', 'lilili_prod', 'lilili_user', 'p@ss', 'db', '5432'),
+        )
+        self.assertEqual(database['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(parse_database_url('sqlite:////tmp/app.db')['NAME'], '/tmp/app.db')
+
+    def test_pool_mode_leaves_the_health_check_to_django(self):
+        database = database_config('postgres://u:p@db/app', mode='pool', pool_max_size=20, conn_max_age=300)
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(
+            database['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10, 'max_idle': 300}
+        )
+
+    def test_pgbouncer_mode_keeps_checked_connections_without_server_state(self):
+        database = database_config('postgres://u:p@pgbouncer:6432/app', mode='pgbouncer', conn_max_age=300)
+        self.assertEqual(database['CONN_MAX_AGE'], 300)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertIsNone(database['OPTIONS']['prepare_threshold'])
+        with self.assertRaises(ValueError):
+            database_config('postgres://u:p@db/app', mode='unknown')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTestCase(SupplierAPITestCase):
+    def test_reads_use_replicas_only_when_enabled_and_outside_transactions(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Supplier), 'default')
+        with replica_reads():
+            with mock.patch.object(db_routing.connections['default'], 'in_atomic_block', False):
+                self.assertEqual(router.db_for_read(Supplier), 'replica_1')
+            # TestCase держит транзакцию открытой — чтения остаются в primary
+            self.assertEqual(router.db_for_read(Supplier), 'default')
+        self.assertEqual(router.db_for_write(Supplier), 'default')
+        self.assertFalse(router.allow_migrate('replica_1', 'suppliers'))
+
+    def test_catalogue_reads_go_to_replica_until_the_user_writes(self):
+        supplier = self.create_supplier()
+        seen = []
+
+        def record(*args, **kwargs):
+            seen.append(db_routing._replica_reads.get())
+            return mock.DEFAULT
+
+        with mock.patch.object(SupplierFacetService, 'get_facets', side_effect=record, return_value={}):
+            self.client.get('/api/v1/suppliers/facets/')
+            with self.captureOnCommitCallbacks(execute=True), \
+                    mock.patch('apps.suppliers.views.enqueue_verification', return_value=('t', True)), \
+                    mock.patch('apps.suppliers.tasks.expire_supplier_responses.apply_async'):
+                response = self.client.post(f'/api/v1/suppliers/{supplier.pk}/verify/')
+            self.assertIn(PIN_COOKIE, response.cookies)
+            # Клиент с bearer-токеном cookie не присылает — закрепление по пользователю
+            self.client.cookies.clear()
+            self.client.get('/api/v1/suppliers/facets/')
+        self.assertEqual(seen, [True, False])
+        self.assertFalse(db_routing._replica_reads.get())
+
+
+class ReferenceDataCacheTestCase(SupplierAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch('apps.utils.reference_cache.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lookups_are_served_from_process_memory(self):
+        LogisticsCompany.objects.create(name='CDEK')
+        self.client.get('/api/v1/suppliers/logistics/')
+        supplier = self.create_supplier(country='Турция', city='Стамбул')
+        supplier = Supplier.objects.get(pk=supplier.pk)
+        reference_data.get('countries')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/suppliers/logistics/')
+            self.assertEqual(VerificationService(supplier).country['code'], 'TR')
+        self.assertEqual([row['name'] for row in response.data['results']], ['CDEK'])
+
+    def test_admin_edit_is_published_to_other_processes(self):
+        self.client.get('/api/v1/suppliers/logistics/')
+        with self.captureOnCommitCallbacks(execute=True):
+            LogisticsCompany.objects.create(name='Деловые линии')
+        self.assertEqual(self.redis.published, [('reference:invalidate', '["logistics"]')])
+
+        response = self.client.get('/api/v1/suppliers/logistics/')
+        self.assertEqual([row['name'] for row in response.data['results']], ['Деловые линии'])
+
+    def test_listener_drops_tables_named_in_messages(self):
+        class Stop(Exception):
+            pass
+
+        reference_data.get('logistics')
+        LogisticsCompany.objects.bulk_create([LogisticsCompany(name='ПЭК')])  # без сигналов
+        self.assertEqual(reference_data.get('logistics'), [])
+
+        client = mock.Mock()
+        client.pubsub.return_value.listen.return_value = iter([{'data': '["logistics"]'}])
+        with mock.patch('apps.utils.reference_cache.redis.Redis.from_url',
+                        side_effect=[client, redis.ConnectionError('down')]), \
+                mock.patch('apps.utils.reference_cache.time.sleep', side_effect=Stop), \
+                self.assertRaises(Stop):
+            reference_data._listen()
+        client.pubsub.return_value.subscribe.assert_called_once_with('reference:invalidate')
+        self.assertEqual([row['name'] for row in reference_data.get('logistics')], ['ПЭК'])
+
+    @override_settings(REFERENCE_CACHE_TTL=0)
+    def test_entries_expire_without_messages(self):
+        reference_data.get('logistics')
+        with self.assertNumQueries(1):
+            reference_data.get('logistics')
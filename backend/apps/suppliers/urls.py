@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import SupplierViewSet, CategoryListAPIView, LogisticsListAPIView
+from .views import SupplierViewSet, CategoryListAPIView, CategoryTreeAPIView, LogisticsListAPIView
 
 app_name = "suppliers"
 
@@ -10,6 +10,7 @@ router.register("", SupplierViewSet, basename="supplier")
 
 urlpatterns = [
     path("categories/", CategoryListAPIView.as_view(), name="category-list"),
+    path("categories/tree/", CategoryTreeAPIView.as_view(), name="category-tree"),
     path("logistics/", LogisticsListAPIView.as_view(), name="logistics-list"),
     path("", include(router.urls)),
 ]
\ No newline at end of file
@@ -1,45 +1,121 @@
+import uuid
+
+from django.db.models import F, Prefetch
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, generics, status, viewsets
+from rest_framework import filters, generics, serializers, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.utils.db_routing import ReplicaReadMixin
 
+from .caching import CachedConditionalGetMixin
+from .filters import SupplierFilterSet, SupplierSearchFilter
 from .models import Supplier, Category, LogisticsCompany
 from .serializers import (
     SupplierSerializer,
     CategorySerializer,
     LogisticsSerializer,
+    VerificationCheckDetailSerializer,
     VerificationCheckSerializer,
 )
-from rest_framework.pagination import PageNumberPagination
-from .tasks import verify_supplier_task, batch_verify_suppliers
-
-
-class StandardPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "page_size"
-    max_page_size = 100
+from .pagination import SupplierPagination
+from .progress import BatchProgress
+from .reference import logistics_companies
+from .registries import RegistryResponseCache
+from .services import CategoryTreeService, SupplierFacetService
+from .tasks import batch_verify_suppliers, enqueue_verification
 
 
-class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = (
-        Supplier.objects.filter(is_active=True)
-        .select_related("category")
-        .prefetch_related("logistics_options", "verification_checks")
-    )
+class SupplierViewSet(ReplicaReadMixin, CachedConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ``?fields=id,name,...`` ограничивает набор полей, ``?expand=category,...``
+    — связи, выводимые вложенными объектами (без параметра — все, пустое
+    значение — ни одной). Запрос к БД подгружает только нужное.
+    """
+    queryset = Supplier.objects.filter(is_active=True)
     serializer_class = SupplierSerializer
-    pagination_class = StandardPagination
+    pagination_class = SupplierPagination
     permission_classes = [IsAuthenticated]
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
         filters.OrderingFilter,
+        SupplierSearchFilter,
     ]
-    filterset_fields = ["country", "category__slug", "city", "moq"]
-    search_fields = ["name", "description", "country", "city"]
+    filterset_class = SupplierFilterSet
     ordering_fields = ["created_at", "moq", "name"]
     ordering = ["-created_at"]
 
+    def get_sparse_fieldsets(self):
+        """Разбирает ?fields= и ?expand=; None — параметр не передан"""
+        if not hasattr(self, "_sparse_fieldsets"):
+            fields = self._parse_list_param("fields", SupplierSerializer.Meta.fields)
+            expand = self._parse_list_param("expand", SupplierSerializer.EXPANDABLE)
+            self._sparse_fieldsets = fields, expand
+        return self._sparse_fieldsets
+
+    def _parse_list_param(self, name, allowed):
+        if name not in self.request.query_params:
+            return None
+        values = {value.strip() for value in self.request.query_params[name].split(",") if value.strip()}
+        unknown = values - set(allowed)
+        if unknown:
+            raise ParseError(f"Неизвестные значения {name}: {', '.join(sorted(unknown))}")
+        return values
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), SupplierSerializer):
+            kwargs["fields"], kwargs["expand"] = self.get_sparse_fieldsets()
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        fields, expand = self.get_sparse_fieldsets()
+
+        def wanted(name):
+            return fields is None or name in fields
+
+        def expanded(name):
+            return wanted(name) and (expand is None or name in expand)
+
+        queryset = super().get_queryset()
+        if wanted("country") or wanted("country_code"):
+            queryset = queryset.select_related("country")
+        if wanted("city"):
+            queryset = queryset.select_related("city")
+        if expanded("category"):
+            queryset = queryset.prefetch_related(
+                Prefetch("category", queryset=CategorySerializer.with_supplier_count(Category.objects.all()))
+            )
+        if expanded("latest_check"):
+            queryset = queryset.select_related("latest_check__country")
+        if expanded("logistics_options"):
+            queryset = queryset.prefetch_related("logistics_options")
+        elif wanted("logistics_options"):
+            queryset = queryset.prefetch_related(
+                Prefetch("logistics_options", queryset=LogisticsCompany.objects.only("id"))
+            )
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, _ = self.get_sparse_fieldsets()
+        if fields is None:
+            return queryset
+        # Колонки: запрошенные поля, их источники и поля сортировки (нужны keyset-курсору)
+        model_fields = {field.name for field in Supplier._meta.concrete_fields}
+        loaded = {"id"}
+        for name in fields:
+            loaded.update(SupplierSerializer.FIELD_SOURCES.get(name, (name,)))
+        for item in queryset.query.order_by or Supplier._meta.ordering:
+            if isinstance(item, str):
+                loaded.add(item.lstrip("-"))
+            elif isinstance(getattr(item, "expression", None), F):
+                loaded.add(item.expression.name)
+        return queryset.only(*(loaded & model_fields))
+
     @action(detail=True, methods=["get"])
     def contacts(self, request, pk=None):
         supplier = self.get_object()
@@ -55,18 +131,28 @@ class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
     def verification_checks(self, request, pk=None):
         supplier = self.get_object()
         serializer = VerificationCheckSerializer(
-            supplier.verification_checks.all(), many=True
+            supplier.verification_checks.select_related("country"), many=True
         )
         return Response(serializer.data)
 
+    @action(detail=True, methods=["get"], url_path=r"verification_checks/(?P<check_id>\d+)")
+    def verification_check_detail(self, request, pk=None, check_id=None):
+        supplier = self.get_object()
+        check = get_object_or_404(supplier.verification_checks.select_related("country"), pk=check_id)
+        return Response(VerificationCheckDetailSerializer(check).data)
+
     @action(detail=True, methods=["post"])
     def verify(self, request, pk=None):
         supplier = self.get_object()
-        task = verify_supplier_task.delay(supplier.id)
+        task_id, created = enqueue_verification(supplier.id)
         return Response(
             {
-                "task_id": task.id,
-                "message": "Проверка запущена. Результат появится автоматически.",
+                "task_id": task_id,
+                "message": (
+                    "Проверка запущена. Результат появится автоматически."
+                    if created
+                    else "Проверка уже запущена. Результат появится автоматически."
+                ),
             },
             status=status.HTTP_202_ACCEPTED,
         )
@@ -74,25 +160,76 @@ class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=["post"])
     def verify_all(self, request):
         supplier_ids = request.data.get("supplier_ids")
-        if supplier_ids and not isinstance(supplier_ids, list):
+        # Строки вида "12" приводятся к int: задача сравнивает ID с границей чанка
+        ids_field = serializers.ListField(child=serializers.IntegerField(min_value=1))
+        try:
+            supplier_ids = ids_field.run_validation(supplier_ids) if supplier_ids else None
+        except serializers.ValidationError:
             return Response(
-                {"detail": "supplier_ids должен быть массивом ID."},
+                {"detail": "supplier_ids должен быть массивом целых ID."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        batch_verify_suppliers.delay(supplier_ids)
+        batch_id = uuid.uuid4().hex
+        batch_verify_suppliers.delay(supplier_ids, batch_id=batch_id)
         return Response(
-            {"message": "Пакетная проверка поставщиков запущена."},
+            {
+                "batch_id": batch_id,
+                "message": "Пакетная проверка поставщиков запущена.",
+            },
             status=status.HTTP_202_ACCEPTED,
         )
 
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """Счётчики для панели фильтров по текущим фильтрам и поиску"""
+        ignored = {"page", "page_size", "cursor", "ordering", "fields", "expand"}
+        signature = repr(sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name not in ignored
+            for value in values
+        ))
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(SupplierFacetService.get_facets(queryset, signature))
+
+    @action(detail=False, methods=["get"], url_path=r"batches/(?P<batch_id>[0-9a-f]{32})")
+    def batch_status(self, request, batch_id=None):
+        progress = BatchProgress(batch_id).status()
+        if progress is None:
+            return Response(
+                {"detail": "Пакетная проверка не найдена."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(progress)
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def registry_cache_stats(self, request):
+        return Response(RegistryResponseCache().stats())
+
 
-class CategoryListAPIView(generics.ListAPIView):
-    queryset = Category.objects.all()
+class CategoryListAPIView(ReplicaReadMixin, generics.ListAPIView):
+    queryset = CategorySerializer.with_supplier_count(Category.objects.all())
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
 
 
-class LogisticsListAPIView(generics.ListAPIView):
+class CategoryTreeAPIView(APIView):
+    """Всё дерево категорий с вложенными children (из кэша)"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(CategoryTreeService.get_tree())
+
+
+class LogisticsListAPIView(ReplicaReadMixin, generics.ListAPIView):
+    """Список из справочника процесса — без запроса к БД"""
     queryset = LogisticsCompany.objects.all()
     serializer_class = LogisticsSerializer
     permission_classes = [AllowAny]
+
+    def list(self, request, *args, **kwargs):
+        companies = sorted(logistics_companies(), key=lambda company: company["name"])
+        page = self.paginate_queryset(companies)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(companies, many=True).data)
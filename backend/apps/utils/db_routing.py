@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = "db_primary_pin"
+PIN_KEY_PREFIX = "db:primary-pin:user"
+
+# Чтение с реплик включается явно (ReplicaReadMixin); по умолчанию — primary
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+@contextmanager
+def replica_reads(enabled: bool = True) -> Iterator[None]:
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def use_primary():
+    return replica_reads(False)
+
+
+def pin_primary() -> Token:
+    """Закрепляет текущий контекст за primary до ``unpin(token)``"""
+    return _replica_reads.set(False)
+
+
+def unpin(token: Token) -> None:
+    _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a random replica from ``DATABASE_REPLICAS`` while replica
+    reads are enabled for the current context, everything else to ``default``.
+
+    Reads inside a transaction on the primary stay on the primary, so they
+    see the transaction's own writes. Migrations run on the primary only.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if replicas and _replica_reads.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def pin_window() -> int:
+    return getattr(settings, "DATABASE_PRIMARY_PIN_SECONDS", 10)
+
+
+def pin_key(user_id) -> str:
+    return f"{PIN_KEY_PREFIX}:{user_id}"
+
+
+def is_pinned(request) -> bool:
+    """Пользователь недавно писал — его чтения идут в primary, пока реплики не догонят"""
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_authenticated and cache.get(pin_key(user.pk)))
+
+
+class ReadYourWritesMiddleware:
+    """
+    After a write request pins the client to the primary for
+    ``DATABASE_PRIMARY_PIN_SECONDS``: by user ID in the shared cache (API
+    clients with a bearer token send no cookies) and by a cookie for
+    anonymous and session clients.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 500:
+            window = pin_window()
+            # DRF переносит пользователя, аутентифицированного по JWT, в HttpRequest
+            user = getattr(request, "user", None)
+            if user and user.is_authenticated:
+                cache.set(pin_key(user.pk), 1, window)
+            response.set_cookie(PIN_COOKIE, "1", max_age=window, httponly=True, samesite="Lax")
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Safe requests of a DRF view read from replicas unless the client is
+    pinned to the primary. Replica reads are switched on after
+    authentication (the user lookup stays on the primary) and off in
+    ``finalize_response``.
+    """
+
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and getattr(settings, "DATABASE_REPLICAS", [])
+            and not is_pinned(request)
+        ):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._replica_token is not None:
+            _replica_reads.reset(self._replica_token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
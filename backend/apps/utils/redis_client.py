@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+import redis
+from django.conf import settings
+
+_client: Optional[redis.Redis] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """
+    Shared Redis connection pool of the current process.
+
+    Short socket timeouts keep callers responsive when Redis is down; callers
+    treat ``redis.RedisError`` as "no data" rather than failing the request.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_connect_timeout=getattr(settings, "REDIS_SOCKET_TIMEOUT", 0.5),
+                    socket_timeout=getattr(settings, "REDIS_SOCKET_TIMEOUT", 0.5),
+                    decode_responses=True,
+                )
+                _client_pid = pid
+    return _client
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import redis
+from django.conf import settings
+
+from apps.utils.db_routing import use_primary
+from apps.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "reference:invalidate"
+RECONNECT_DELAY = 5
+
+
+class ReferenceCache:
+    """
+    In-process (L1) cache of small, nearly static tables.
+
+    Every table is loaded whole by its loader on first use and kept in the
+    process memory, so lookups need neither Redis nor the database. A write
+    calls ``publish``: the local copy is dropped at once and the table name
+    goes to the ``reference:invalidate`` Redis channel, to which a daemon
+    thread of every daphne/Celery process is subscribed. Pub/sub delivery is
+    not guaranteed, so entries also expire after ``REFERENCE_CACHE_TTL``
+    seconds and everything is dropped whenever the subscription
+    (re)connects. Loaded values are shared between threads and must be
+    treated as read-only.
+    """
+
+    def __init__(self):
+        self.loaders: Dict[str, Callable[[], Any]] = {}
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        # Поколение таблицы: загрузка, которую обогнала инвалидация, не сохраняется
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._listener_pid: Optional[int] = None
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        self.loaders[name] = loader
+
+    def get(self, name: str) -> Any:
+        self._ensure_listener()
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        generation = self._generations.get(name, 0)
+        # Справочник живёт долго — читаем из primary, а не с отстающей реплики
+        with use_primary():
+            value = self.loaders[name]()
+        ttl = getattr(settings, "REFERENCE_CACHE_TTL", 5 * 60)
+        with self._lock:
+            if self._generations.get(name, 0) == generation:
+                self._entries[name] = (time.monotonic() + ttl, value)
+        return value
+
+    def invalidate_local(self, *names: str) -> None:
+        """Drops the given tables (all without arguments) in this process only."""
+        with self._lock:
+            for name in names or list(self.loaders):
+                self._generations[name] = self._generations.get(name, 0) + 1
+                self._entries.pop(name, None)
+
+    def publish(self, *names: str) -> None:
+        """Drops the tables here and in every other process."""
+        self.invalidate_local(*names)
+        try:
+            get_redis().publish(CHANNEL, json.dumps(names))
+        except redis.RedisError as exc:
+            logger.debug("Reference cache invalidation not published: %s", exc)
+
+    def _ensure_listener(self) -> None:
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+        threading.Thread(target=self._listen, name="reference-cache-listener", daemon=True).start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_connect_timeout=getattr(settings, "REDIS_SOCKET_TIMEOUT", 0.5),
+                    health_check_interval=30,
+                    decode_responses=True,
+                )
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Пока подписки не было, сообщения могли потеряться
+                self.invalidate_local()
+                for message in pubsub.listen():
+                    self.invalidate_local(*json.loads(message["data"]))
+            except redis.RedisError as exc:
+                logger.debug("Reference cache subscription lost: %s", exc)
+                time.sleep(RECONNECT_DELAY)
@@ -3,6 +3,7 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import apps.orders.routing  # Будет создан позже
+import apps.suppliers.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
@@ -11,6 +12,7 @@ application = ProtocolTypeRouter({
     "websocket": AuthMiddlewareStack(
         URLRouter(
             apps.orders.routing.websocket_urlpatterns
+            + apps.suppliers.routing.websocket_urlpatterns
         )
     ),
 })
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import task_postrun, task_prerun
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
@@ -9,6 +10,27 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 
+_primary_pins = {}
+
+
+@task_prerun.connect
+def pin_task_to_primary(task_id=None, **kwargs):
+    # Задачи (проверки поставщиков и т.п.) не читают с реплик: они пишут по
+    # только что прочитанным данным, и отставание реплики дало бы гонки
+    from apps.utils.db_routing import pin_primary
+
+    _primary_pins[task_id] = pin_primary()
+
+
+@task_postrun.connect
+def unpin_task(task_id=None, **kwargs):
+    from apps.utils.db_routing import unpin
+
+    token = _primary_pins.pop(task_id, None)
+    if token is not None:
+        unpin(token)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f"Request: {self.request!r}")
@@ -0,0 +1,86 @@
+"""
+DATABASES from ``DATABASE_URL``.
+
+``parse_database_url`` understands ``postgres://``/``postgresql://`` and
+``sqlite:///path`` URLs (dj-database-url style: credentials are URL-decoded,
+query parameters go to ``OPTIONS``). ``database_config`` adds the connection
+reuse strategy for PostgreSQL:
+
+* ``pool`` — psycopg connection pool inside the process (daphne): the pool
+  keeps warm connections (Django checks them on checkout because of
+  ``CONN_HEALTH_CHECKS``), a request borrows one and returns it when the
+  request ends;
+* ``persistent`` — one connection per thread kept for ``conn_max_age``
+  seconds and checked before reuse;
+* ``pgbouncer`` — persistent connections to PgBouncer in transaction pooling
+  mode (Celery prefork workers): server-side cursors and prepared statements
+  are disabled because consecutive transactions may run on different server
+  connections.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+ENGINES = {
+    "postgres": "django.db.backends.postgresql",
+    "postgresql": "django.db.backends.postgresql",
+    "pgsql": "django.db.backends.postgresql",
+    "sqlite": "django.db.backends.sqlite3",
+}
+POOL_MODES = ("pool", "persistent", "pgbouncer")
+
+
+def parse_database_url(url: str) -> Dict[str, Any]:
+    parts = urlsplit(url)
+    if parts.scheme not in ENGINES:
+        raise ValueError(f"Unsupported DATABASE_URL scheme: {parts.scheme!r}")
+    engine = ENGINES[parts.scheme]
+    if engine.endswith("sqlite3"):
+        # sqlite:///relative.db, sqlite:////absolute.db, sqlite://:memory:
+        path = parts.path[1:] if parts.path.startswith("/") else parts.path
+        return {"ENGINE": engine, "NAME": path or parts.netloc or ":memory:"}
+    return {
+        "ENGINE": engine,
+        "NAME": unquote(parts.path.lstrip("/")),
+        "USER": unquote(parts.username or ""),
+        "PASSWORD": unquote(parts.password or ""),
+        "HOST": parts.hostname or "",
+        "PORT": str(parts.port or ""),
+        "OPTIONS": dict(parse_qsl(parts.query)),
+    }
+
+
+def database_config(
+    url: str,
+    mode: str = "pool",
+    conn_max_age: int = 600,
+    pool_min_size: int = 2,
+    pool_max_size: int = 10,
+    pool_timeout: float = 10,
+) -> Dict[str, Any]:
+    database = parse_database_url(url)
+    if not database["ENGINE"].endswith("postgresql"):
+        return database
+    if mode not in POOL_MODES:
+        raise ValueError(f"DATABASE_POOL_MODE must be one of {', '.join(POOL_MODES)}, got {mode!r}")
+
+    options = database["OPTIONS"]
+    # С пулом Django сам передаёт ConnectionPool(check=...) по CONN_HEALTH_CHECKS
+    database["CONN_HEALTH_CHECKS"] = True
+    if mode == "pool":
+        # Пул сам держит соединения открытыми, CONN_MAX_AGE с ним несовместим
+        database["CONN_MAX_AGE"] = 0
+        options["pool"] = {
+            "min_size": pool_min_size,
+            "max_size": pool_max_size,
+            "timeout": pool_timeout,
+            "max_idle": conn_max_age,
+        }
+        return database
+
+    database["CONN_MAX_AGE"] = conn_max_age
+    if mode == "pgbouncer":
+        database["DISABLE_SERVER_SIDE_CURSORS"] = True
+        options["prepare_threshold"] = None
+    return database
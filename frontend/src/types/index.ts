@@ -29,6 +29,7 @@ export interface VerificationSourceSnapshot {
   score: number | null;
   details?: string;
   payload?: Record<string, unknown> | null;
+  payload_ref?: string;
 }
 
 export interface VerificationCheck {
@@ -55,6 +56,7 @@ export interface Supplier {
   id: number;
   name: string;
   country: string;
+  country_code?: string | null;
   city: string;
   description: string;
   logo?: string | null;